@@ -1,13 +1,21 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox
+import queue
 import socket
 import threading
+import uuid
 from arinc429 import ARINC429
-
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from protocol import ACK, BINARY, BUS, DELTA, HELLO, SESSION, TICK, format_options, pack_words, parse_options, read_line, WordStreamDecoder
+from bus import BusListener
+from history import History, lttb
+from recorder import BusRecorder, FROM_CALCULATOR, TO_CALCULATOR
 import time
 
+PLOT_POINTS = 500  # Points drawn for the visible range, downsampled from the full history
+TARGET_FPS = 30  # Plot redraws per second at most, whatever the telemetry rate
+PLOT_HEADROOM = 0.25  # Fraction of the data span left free when rescaling, so full redraws stay rare
+
 
 def handle_state(state: int) -> str:
     if state == ARINC429.ON_GROUND:
@@ -21,7 +29,8 @@ def handle_state(state: int) -> str:
 
 
 class ARINC429GUI(tk.Tk):
-    def __init__(self, host="127.0.0.1", port=65432):
+    def __init__(self, host="127.0.0.1", port=65432, binary=True, tick_rate=10, keepalive=None, recorder=None,
+                 bus=False):
         super().__init__()
         self.title("ARINC 429 Interface")
         self.geometry("600x400")
@@ -40,18 +49,36 @@ class ARINC429GUI(tk.Tk):
 
         self.flag = False
 
-        self.altitude_history = []
-        self.time_history = []
+        self.history = History()  # Every altitude point of the flight
+        self.follow_var = tk.BooleanVar(value=True)  # Show the whole flight; cleared by zooming or panning
+        self.refit = False  # Fit the axes to the data at the next redraw
+        self.rescaling = False  # True while the axes limits are changed by rescale, not by the user
         self.time = 0
+        self.plot_dirty = False  # New points not drawn yet
+        self.plot_altitude = 0.0  # Altitude plotted for each batch, the last one received
+        self.telemetry = queue.SimpleQueue()  # {label: decoded value} per received batch, for the Tk thread
+        self.background = None  # Plot without the altitude line, restored before each blit
+        self.canvas = None  # Created with the plot, when there is a first point to draw
 
         self.host = host
         self.port = port
         self.socket = None
         self.connected = False
+        self.binary = binary
+        self.tick_rate = tick_rate  # Telemetry pushed by the server at this rate (Hz); None to poll
+        self.pushed = False  # True once the server accepted to drive the simulation clock
+        self.keepalive = keepalive  # With pushed telemetry, only receive changes plus a refresh every N s
+        self.recorder = recorder  # BusRecorder capturing the words of each connection, if any
+        self.session_id = None
+        self.token = uuid.uuid4().hex  # Lets the server resume this flight after a reconnect
+        self.bus = bus  # Receive the pushed telemetry from the server's UDP bus rather than the connection
+        self.bus_address = None  # (group, port) being listened to
+        self.bus_source = None  # Source id of this connection's datagrams
 
         self.create_widgets()
         self.connect_thread = threading.Thread(target=self.connect_loop, daemon=True)
         self.connect_thread.start()
+        self.after(int(1000 / TARGET_FPS), self.refresh_ui)
 
     def create_widgets(self):
         # Configure the main window
@@ -110,39 +137,139 @@ class ARINC429GUI(tk.Tk):
         ttk.Label(left_frame, text="Current state:").grid(row=9, column=0, sticky="w")
         ttk.Label(left_frame, textvariable=self.status_var).grid(row=9, column=1, sticky="w")
 
+        ttk.Checkbutton(left_frame, text="Follow flight", variable=self.follow_var,
+                        command=self.on_follow).grid(row=10, column=0, columnspan=2, sticky="w", pady=(5, 0))
+
         # Make entry columns stretch a little
         left_frame.columnconfigure(1, weight=1)
 
-        # === RIGHT SIDE: Matplotlib plot ===
+        # === RIGHT SIDE: Matplotlib plot, created by create_plot ===
+        self.plot_frame = right_frame
+        self.plot_placeholder = ttk.Label(right_frame, text="Waiting for telemetry...", foreground="gray")
+        self.plot_placeholder.pack(expand=True)
+
+    def create_plot(self):
+        """Build the altitude plot; matplotlib is only imported here, so the window opens without it."""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        self.plot_placeholder.destroy()
         fig = Figure(figsize=(5, 3), dpi=100)
         self.ax = fig.add_subplot(111)
-        self.altitude_line, = self.ax.plot([], [], label="Altitude (ft)")
+        self.altitude_line, = self.ax.plot([], [], label="Altitude (ft)", animated=True)
         self.ax.set_xlabel("Time (min)")
         self.ax.set_ylabel("Altitude (ft)")
         self.ax.set_title("Altitude vs Time")
         self.ax.grid(True)
+        self.ax.set_autoscale_on(False)  # Limits are set by rescale or by the user
 
         fig.tight_layout()
 
-        self.canvas = FigureCanvasTkAgg(fig, master=right_frame)
+        self.canvas = FigureCanvasTkAgg(fig, master=self.plot_frame)
+        toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame, pack_toolbar=False)
+        toolbar.pack(side="bottom", fill="x")
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        self.ax.callbacks.connect("xlim_changed", self.on_xlim_changed)
         self.canvas.draw()
 
-    def update_altitude_plot(self):
-        if self.altitude_var.get() is None:
-            return
+    def refresh_ui(self):
+        """Apply the telemetry queued by the socket reader and redraw, TARGET_FPS times per second."""
+        self.after(int(1000 / TARGET_FPS), self.refresh_ui)
+        self.drain_telemetry()
+        if self.plot_dirty:
+            self.refresh_plot()
+
+    def drain_telemetry(self):
+        """Plot one point per queued batch carrying label 001 and show only the latest value of each label."""
+        latest = {}
+        while True:
+            try:
+                batch = self.telemetry.get_nowait()
+            except queue.Empty:
+                break
+            latest.update(batch)
+            if 1 in batch:
+                if batch[1][0] is not None:
+                    self.plot_altitude = batch[1][0]
+                self.update_altitude_plot(self.plot_altitude)
+
+        if 1 in latest:
+            altitude, state = latest[1]
+            self.altitude_var.set(altitude)
+            self.status_var.set(handle_state(state))
+        if 2 in latest:
+            self.rise_var.set(latest[2])
+        if 3 in latest:
+            self.angle_var.set(latest[3])
+        if 4 in latest:
+            self.power_var.set(latest[4])
+
+    def update_altitude_plot(self, altitude: float):
+        """Record an altitude point; refresh_plot draws it at the next frame."""
         self.time += 1
-        self.time_history.append(self.time/60)
-        self.altitude_history.append(float(self.altitude_var.get()))
+        self.history.append(self.time / 60, altitude)
+        self.plot_dirty = True
+
+    def refresh_plot(self):
+        """Redraw the altitude line from the history, blitting it unless the axes have to be rescaled.
+
+        Following the flight, the whole history is shown; otherwise the range
+        the user zoomed or panned to. Either way it is downsampled with LTTB.
+        """
+        self.plot_dirty = False
+        span = self.history.span()
+        if span is None:
+            return
+        if self.canvas is None:
+            self.create_plot()
+        follow = self.follow_var.get()
+        low, high = span if follow else self.ax.get_xlim()
+        x, y = lttb(*self.history.between(low, high), PLOT_POINTS)
+        self.altitude_line.set_data(x, y)
+        rescaled = follow and self.rescale(x, y, self.refit)
+        self.refit = False
+        if rescaled or self.background is None:
+            self.canvas.draw()  # on_draw saves the new background and draws the line
+        else:
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.altitude_line)
+            self.canvas.blit(self.ax.bbox)
+
+    def rescale(self, x, y, force=False) -> bool:
+        """Fit the axes to the data, with headroom, if it left them or `force`; True if they changed."""
+        if not len(x):
+            return False
+        (left, right), (bottom, top) = self.ax.get_xlim(), self.ax.get_ylim()
+        low, high = y.min(), y.max()
+        if not force and left <= x[0] and x[-1] <= right and bottom <= low and high <= top:
+            return False
+        span = max(x[-1] - x[0], 1 / 60)
+        margin = max((high - low) * PLOT_HEADROOM, 100)
+        self.rescaling = True
+        try:
+            self.ax.set_xlim(x[0], x[-1] + span * PLOT_HEADROOM)
+            self.ax.set_ylim(low - margin, high + margin)
+        finally:
+            self.rescaling = False
+        return True
 
-        # Keep last 100 points for performance
-        self.time_history = self.time_history[-400:]
-        self.altitude_history = self.altitude_history[-400:]
+    def on_xlim_changed(self, ax):
+        """The user zoomed or panned: stop following and resample the new range."""
+        if self.rescaling:
+            return
+        self.follow_var.set(False)
+        self.plot_dirty = True
 
-        self.altitude_line.set_data(self.time_history, self.altitude_history)
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.canvas.draw()
+    def on_follow(self):
+        if self.follow_var.get():
+            self.refit = True
+            self.plot_dirty = True
+
+    def on_draw(self, event):
+        """After a full redraw (rescale, resize), save the background and draw the animated line on it."""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.altitude_line)
 
 
     def connect_loop(self):
@@ -151,15 +278,53 @@ class ARINC429GUI(tk.Tk):
                 try:
                     self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                     self.socket.connect((self.host, self.port))
+                    if self.binary or self.tick_rate:
+                        accepted = self.negotiate()
+                        if accepted is None:
+                            # Older server: fall back to text framing and polling on the next attempt
+                            self.binary = False
+                            self.tick_rate = None
+                            self.socket.close()
+                            continue
+                        self.binary = BINARY in accepted
+                        self.pushed = TICK in accepted
+                        if BUS in accepted:
+                            self.listen_to_bus(accepted[BUS])
+                    if self.recorder is not None:
+                        self.session_id = self.recorder.new_session()
                     self.connected = True
                     self.update_status("Connected", "green")
                     threading.Thread(target=self.listen_to_socket, daemon=True).start()
                 except socket.error:
+                    self.socket.close()
                     self.update_status("Reconnecting...", "orange")
                     time.sleep(3)
             else:
                 time.sleep(1)
 
+    def negotiate(self) -> dict | None:
+        """Send the handshake; return the options the server accepted, None if it does not know it.
+
+        A server that closes the connection or answers something else is an
+        older one; timeouts and resets raise socket.error, to be retried.
+        """
+        requested = {}
+        if self.binary:
+            requested[BINARY] = ""
+        requested[SESSION] = self.token
+        if self.tick_rate:
+            requested[TICK] = self.tick_rate
+            if self.keepalive:
+                requested[DELTA] = self.keepalive
+            if self.bus:
+                requested[BUS] = ""
+        self.socket.settimeout(3)
+        try:
+            self.socket.sendall(format_options(HELLO, requested))
+            return parse_options(ACK, read_line(self.socket))
+        finally:
+            self.socket.settimeout(None)
+
     def update_status(self, text, color):
         def _update():
             self.status_label.config(text=text, foreground=color)
@@ -219,43 +384,65 @@ class ARINC429GUI(tk.Tk):
             messagebox.showwarning("Not connected", "Currently not connected to the server.")
             return
 
-        self.socket.sendall(str(data).encode()+"\n".encode())
+        self.socket.sendall(pack_words([data], self.binary))
+        if self.recorder is not None:
+            self.recorder.record(self.session_id, TO_CALCULATOR, [data])
+
+
+    def handle_words(self, words):
+        """Decode a batch of words received from the server and queue it for the Tk thread."""
+        if self.recorder is not None:
+            self.recorder.record(self.session_id, FROM_CALCULATOR, words)
+        batch = {}
+        for data in words:
+            decoded = ARINC429.decode(data)
+            if decoded == [None]:
+                print("No data")
+                print(data)
+                continue
+
+            label, sdi, ssm, out = decoded
+            if label == 1:
+                self.status = out[1]  # Sent back with the altitude setpoint
+            if label in (1, 2, 3, 4):
+                batch[label] = out
+        if batch:
+            # Tk is only touched from its own thread: refresh_ui applies the batch
+            self.telemetry.put(batch)
+
+    def listen_to_bus(self, accepted: str):
+        """Follow this connection's datagrams on the bus the server named; one listener thread per bus."""
+        group, port, source = accepted.split(":")
+        self.bus_source = int(source)
+        if self.bus_address == (group, int(port)):
+            return
+        self.bus_address = (group, int(port))
+        listener = BusListener(group, int(port))
 
+        def run():
+            while self.bus_address == (group, int(port)):
+                result = listener.receive(timeout=1)
+                if result is not None and result[0] == self.bus_source:
+                    self.handle_words(result[1])
+            listener.close()
+
+        threading.Thread(target=run, daemon=True).start()
 
     def listen_to_socket(self):
+        decoder = WordStreamDecoder(self.binary)
         try:
             while self.connected:
-                words = self.socket.recv(256).decode('utf-8').strip().split("\n")
-                if not words:
+                words = decoder.recv_from(self.socket)
+                if words is None:
                     break
-                for word in words:
-                    if not word:
-                        continue
-                    data = int(word)
-                    decoded = ARINC429.decode(data)
-                    if decoded == [None]:
-                        print("No data")
-                        print(data)
-                        continue
-
-                    label, sdi, ssm, out = decoded
-                    if label == 1:
-                        altitude, state = out
-                        self.altitude_var.set(altitude)
-                        self.status = state
-                        self.status_var.set(handle_state(state))
-                    elif label == 2:
-                        self.rise_var.set(out)
-                    elif label == 3:
-                        self.angle_var.set(out)
-                    elif label == 4:
-                        self.power_var.set(out)
-
-                if self.flag:
-                    self.handle_altitude()
-                else:
-                    self.handle_rise()
-                self.update_altitude_plot()
+                self.handle_words(words)
+
+                if not self.pushed:
+                    # Polling server: re-send the setpoint so that it steps the simulation again
+                    if self.flag:
+                        self.handle_altitude()
+                    else:
+                        self.handle_rise()
 
 
         except Exception as e:
@@ -275,10 +462,20 @@ class ARINC429GUI(tk.Tk):
                 self.socket.close()
         except:
             pass
+        if self.recorder is not None:
+            self.recorder.close()
         self.destroy()
 
 
 if __name__ == "__main__":
-    app = ARINC429GUI()
+    parser = argparse.ArgumentParser(description="ARINC 429 aggregator GUI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--record", metavar="PATH", help="append every word exchanged to this bus recording")
+    parser.add_argument("--bus", action="store_true", help="receive the telemetry from the server's UDP bus")
+    args = parser.parse_args()
+
+    app = ARINC429GUI(args.host, args.port, recorder=BusRecorder(args.record) if args.record else None,
+                      bus=args.bus)
     app.protocol("WM_DELETE_WINDOW", app.on_close)
     app.mainloop()
@@ -4,6 +4,229 @@ CRUISE = 2
 ALTITUDE_MAX = 40000
 SigBits = 15
 
+# Lookup tables for the word codec, built once at import time.
+REVERSED_2 = (0, 2, 1, 3)
+REVERSED_BYTE = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+PARITY_BYTE = bytes(bin(i).count("1") & 1 for i in range(256))
+# Octal label (written in decimal digits, e.g. 325) <-> wire byte (bits 31..24)
+LABEL_TO_WIRE = {
+    label: REVERSED_BYTE[((label // 100) << 6) | (((label // 10) % 10) << 3) | (label % 10)]
+    for label in range(400)
+    if (label // 10) % 10 < 8 and label % 10 < 8
+}
+WIRE_TO_LABEL = tuple(
+    (r & 0x07) + ((r >> 3) & 0x07) * 10 + ((r >> 6) & 0x03) * 100
+    for r in (REVERSED_BYTE[b] for b in range(256))
+)
+
+
+def reverse_19(x: int) -> int:
+    """Reverse the 19 data bits of a word; the operation is its own inverse."""
+    return (REVERSED_BYTE[x & 0xFF] << 11) | (REVERSED_BYTE[(x >> 8) & 0xFF] << 3) | (REVERSED_BYTE[(x >> 16) & 0x07] >> 5)
+
+
+BNR = "BNR"
+BCD = "BCD"
+DISCRETE = "discrete"
+DIGIT_TO_BCD = bytes(((n // 10) << 4) | (n % 10) for n in range(100))  # Two decimal digits -> one BCD byte
+BCD_TO_DIGIT = tuple((b >> 4) * 10 + (b & 0x0F) for b in range(256))  # BCD byte -> its value (nibbles may exceed 9)
+BCD_GUARD = 1e-9  # Keeps e.g. 67.1 * 100 = 6709.999... from truncating to 6709
+
+
+class DecodedWord:
+    """Fields of a decoded word, filled in place by ARINC429.decode_into so that one record serves many words.
+
+    `status` holds the discrete status bits of BNR labels that have some,
+    None otherwise; `value` is what ARINC429.decode would return without it.
+    """
+
+    __slots__ = ("label", "sdi", "ssm", "value", "status")
+
+    def __init__(self):
+        self.label = None
+        self.sdi = None
+        self.ssm = None
+        self.value = None
+        self.status = None
+
+    def __repr__(self):
+        return f"DecodedWord(label={self.label}, sdi={self.sdi}, ssm={self.ssm}, value={self.value}, status={self.status})"
+
+
+class Label:
+    """Declaration of a label: how its value is packed in the 19 data bits and what its SSM means.
+
+    BNR: `bits` magnitude bits of `resolution` each, a sign bit above them and
+    `status_bits` of discrete status below them. SSM 3 is normal operation,
+    1 no computed data (None value, only allowed for `ncd_statuses`) and 0 a
+    failure (out of range or unknown status).
+    BCD: `digits` decimal digits of `resolution`, the top one `top_bits` wide.
+    SSM 0 is plus, 3 minus and 1 no computed data.
+    DISCRETE: `bits` raw bits, SSM 0 normal and 1 no computed data.
+
+    The encode/decode/decode_into functions are generated once, when the label is built.
+    """
+
+    def __init__(self, number: int, name: str, fmt: str, bits: int = 0, resolution: float = 1.0, digits: int = 0,
+                 top_bits: int = 4, max_value: float | None = None, status_bits: int = 0, statuses: tuple = (),
+                 ncd_statuses: tuple = ()):
+        if number not in LABEL_TO_WIRE:
+            raise ValueError(f"label {number} is not an octal label number (0 to 377, digits 0 to 7)")
+        self.number = number
+        self.name = name
+        self.format = fmt
+        self.bits = bits
+        self.resolution = resolution
+        self.digits = digits
+        self.top_bits = top_bits
+        self.max_value = max_value
+        self.status_bits = status_bits
+        self.statuses = statuses
+        self.ncd_statuses = ncd_statuses
+
+        if fmt == BNR:
+            width = status_bits + bits + 1
+            self.encode, self.decode, self.decode_into = self.__compile_bnr()
+        elif fmt == BCD:
+            width = 4 * (digits - 1) + top_bits
+            self.encode, self.decode, self.decode_into = self.__compile_bcd()
+        elif fmt == DISCRETE:
+            width = bits
+            self.encode, self.decode, self.decode_into = self.__compile_discrete()
+        else:
+            raise ValueError(f"unknown label format {fmt!r}")
+        if width > 19:
+            raise ValueError(f"label {number:03d} needs {width} data bits, a word has 19")
+
+    def __compile_bnr(self):
+        resolution = self.resolution
+        max_value = self.max_value if self.max_value is not None else ((1 << self.bits) - 1) * resolution
+        status_bits = self.status_bits
+        status_mask = (1 << status_bits) - 1
+        magnitude_mask = (1 << self.bits) - 1
+        sign = 1 << (self.bits + status_bits)
+        statuses = frozenset(self.statuses)
+        ncd_statuses = frozenset(self.ncd_statuses)
+
+        def encode(value: float, status: int | None = None) -> (int, int):
+            if value is None:
+                return (1, status) if status in ncd_statuses else (0, 0)
+            if abs(value) > max_value:
+                return 0, 0
+            # abs(value) // resolution is an exact floor: both are multiples of a power of two
+            data = (int(abs(value) // resolution) & magnitude_mask) << status_bits
+            if value < 0:
+                data |= sign
+            if not status_bits:
+                return 3, data
+            if status in statuses:
+                return 3, data | status
+            return 0, data
+
+        def decode(ssm: int, data: int):
+            if ssm == 0:
+                return (None, None) if status_bits else None
+            if ssm == 1:
+                return (None, data) if status_bits else None
+            value = ((data >> status_bits) & magnitude_mask) * resolution
+            if data & sign:
+                value = -value
+            return (value, data & status_mask) if status_bits else value
+
+        def decode_into(ssm: int, data: int, record: DecodedWord):
+            if ssm == 0:
+                record.value = record.status = None
+                return
+            if ssm == 1:
+                record.value = None
+                record.status = data if status_bits else None
+                return
+            value = ((data >> status_bits) & magnitude_mask) * resolution
+            record.value = -value if data & sign else value
+            record.status = data & status_mask if status_bits else None
+
+        return encode, decode, decode_into
+
+    def __compile_bcd(self):
+        scale = round(1 / self.resolution)
+        lower = self.digits - 1  # Full 4-bit digits below the top one
+        pair_shifts = tuple(range(0, 8 * (lower // 2), 8))
+        single_shift = 8 * (lower // 2) if lower % 2 else None
+        top_shift = 4 * lower
+        top_mask = (1 << self.top_bits) - 1
+        field_mask = (1 << top_shift) - 1 | top_mask << top_shift
+
+        def encode(value: float) -> (int, int):
+            if value is None:
+                return 1, 0
+            ssm = 3 if value < 0 else 0
+            n = int(abs(value) * scale + BCD_GUARD)
+            data = 0
+            for shift in pair_shifts:
+                n, pair = divmod(n, 100)
+                data |= DIGIT_TO_BCD[pair] << shift
+            if single_shift is not None:
+                n, digit = divmod(n, 10)
+                data |= digit << single_shift
+            return ssm, data | (n & top_mask) << top_shift
+
+        def decode(ssm: int, data: int) -> float | None:
+            if ssm == 1:
+                return None
+            data &= field_mask
+            n = 0
+            weight = 1
+            while data:
+                n += BCD_TO_DIGIT[data & 0xFF] * weight
+                data >>= 8
+                weight *= 100
+            value = n / scale
+            return -value if ssm == 3 else value
+
+        def decode_into(ssm: int, data: int, record: DecodedWord):
+            record.value = decode(ssm, data)
+            record.status = None
+
+        return encode, decode, decode_into
+
+    def __compile_discrete(self):
+        mask = (1 << self.bits) - 1
+        single = self.bits == 1
+
+        def encode(value: int) -> (int, int):
+            if value is None:
+                return 1, 0
+            return 0, value & mask
+
+        def decode(ssm: int, data: int):
+            if ssm == 1:
+                return None
+            return bool(data & mask) if single else data & mask
+
+        def decode_into(ssm: int, data: int, record: DecodedWord):
+            record.value = decode(ssm, data)
+            record.status = None
+
+        return encode, decode, decode_into
+
+
+LABELS = {}
+
+
+def register_label(label: Label) -> Label:
+    """Make `label` known to ARINC429.encode/decode and the batch codec."""
+    LABELS[label.number] = label
+    return label
+
+
+register_label(Label(1, "altitude and state", BNR, bits=SigBits + 1, resolution=ALTITUDE_MAX / 2 ** SigBits,
+                     max_value=ALTITUDE_MAX, status_bits=2, statuses=(ON_GROUND, ALTITUDE_CHANGE, CRUISE),
+                     ncd_statuses=(ON_GROUND,)))
+register_label(Label(2, "climb rate (ft/min)", BCD, digits=4, resolution=0.1))
+register_label(Label(3, "angle (deg)", BCD, digits=3, resolution=0.1, top_bits=1))
+register_label(Label(4, "power (%)", BCD, digits=5, resolution=0.01, top_bits=3))
+register_label(Label(5, "automatic mode", DISCRETE, bits=1))
+
 
 class ARINC429:
     ON_GROUND = 0
@@ -14,12 +237,10 @@ class ARINC429:
 
     @staticmethod
     def __get_parity(x: int) -> int:
-        result = 0
-        while x:
-            result ^= x & 1
-            x >>= 1
-        return result ^ 1
-        # or return bin(x).count("1") % 2
+        # Fold the 32-bit word down to one byte, then look its parity up
+        x ^= x >> 16
+        x ^= x >> 8
+        return PARITY_BYTE[x & 0xFF] ^ 1
 
     @staticmethod
     def check_parity(x: int) -> str:
@@ -29,194 +250,60 @@ class ARINC429:
     def is_valid(x: int) -> bool:
         return ARINC429.__get_parity(x >> 1) == x & 1
 
-
-    @staticmethod
-    def __reverse_bits(x: int, num_bits: int) -> int:
-        return sum(((x >> i) & 1) << (num_bits - 1 - i) for i in range(num_bits))
-
-    @staticmethod
-    def __encode_001(altitude: int, state: int) -> (int, int):
-        if altitude is None:
-            return (1, state) if state == ON_GROUND else (0, 0)
-        if abs(altitude) > ALTITUDE_MAX:
-            return 0, 0
-        sign = 1 if altitude < 0 else 0
-        altitude = abs(altitude)
-
-        out = sign << (SigBits + 1)
-        k = SigBits
-        while altitude > 1 and k >= 0:
-            step = ALTITUDE_MAX / (2 ** (SigBits - k))
-            if altitude >= step:
-                out |= 1 << k
-                altitude -= step
-            k -= 1
-
-        out <<= 2
-
-        if state in (ON_GROUND, ALTITUDE_CHANGE, CRUISE):
-            out |= state
-            return 3, out
-
-        return 0, out
-
-
-    @staticmethod
-    def __decode_001(ssm: int, data: int) -> (int, int):
-        if ssm == 0:
-            return None, None
-        if ssm == 1:
-            return None, data  # data is only state in that case
-
-        state = data & 3
-        data >>= 2
-
-        altitude = 0
-        for k in range(SigBits + 1):
-            altitude += (data & 1) * (ALTITUDE_MAX / (2 ** (SigBits - k)))
-            data >>= 1
-
-        if data:
-            altitude = -altitude
-
-        return altitude, state
-
-
-    @staticmethod
-    def __encode_002(rise_rate: float) -> (int, int):
-        if rise_rate is None:
-            return 1, 0
-        ssm = 0
-        if rise_rate < 0:
-            ssm = 3
-        rise_rate = abs(rise_rate)
-        rise_rate_bits = (
-                (int(rise_rate // 100) << 12)
-                | ((int(rise_rate // 10) % 10) << 8)
-                | (int(rise_rate % 10) << 4)
-                | (int(rise_rate * 10) % 10)
-        )
-        return ssm, rise_rate_bits
-
     @staticmethod
-    def __decode_002(ssm: int, data: int) -> float | None:
-        if ssm == 1:
-            return None
-
-        rise_rate = (
-                            (data & 0x0F)
-                            + ((data >> 4) & 0x0F) * 10
-                            + ((data >> 8) & 0x0F) * 100
-                            + ((data >> 12) & 0x0F) * 1000
-                    ) / 10
-        if ssm == 3:
-            rise_rate = -rise_rate
-        return rise_rate
-
-    @staticmethod
-    def __encode_003(angle: float) -> (int, int):
-        if angle is None:
-            return 1, 0
-        ssm = 0
-        if angle < 0:
-            ssm = 3
-        angle = abs(angle)
-        angle_bits = (
-                (int(angle // 10) << 8) | (int(angle % 10) << 4) | (int(angle * 10) % 10)
+    def pack(label: int, sdi: int, ssm: int, data: int) -> int:
+        """Assemble a 32-bit word (with parity) from its raw fields."""
+        result = (
+                LABEL_TO_WIRE[label] << 24
+                | REVERSED_2[sdi & 3] << 22
+                | reverse_19(data & 0x7FFFF) << 3
+                | REVERSED_2[ssm & 3] << 1
         )
-        return ssm, angle_bits
-
-    @staticmethod
-    def __decode_003(ssm: int, data: int) -> float | None:
-        if ssm == 1:
-            return None
-        angle = ((data & 0x0F) + ((data >> 4) & 0x0F) * 10 + ((data >> 8) & 1) * 100) / 10
-        if ssm == 3:
-            angle = -angle
-        return angle
+        return result | ARINC429.__get_parity(result)
 
     @staticmethod
-    def __encode_004(pwr: float) -> (int, int):
-        if pwr is None:
-            return 1, 0
-        ssm = 0
-        if pwr < 0:
-            ssm = 3
-        pwr = abs(pwr)
-        pwr_bits = (
-            ((int(pwr // 100) & 0x07)<< 16) | ((int(pwr // 10) % 10)<< 12) | (int(pwr % 10) << 8) | ((int(pwr * 10) % 10) << 4) |
-                    (int(pwr * 100) % 10)
+    def unpack(word: int) -> (int, int, int, int):
+        """Split a 32-bit word into its raw (label, sdi, ssm, data) fields."""
+        return (
+            WIRE_TO_LABEL[word >> 24 & 0xFF],
+            REVERSED_2[word >> 22 & 3],
+            REVERSED_2[word >> 1 & 3],
+            reverse_19(word >> 3 & 0x7FFFF),
         )
 
-        return ssm, pwr_bits
-
-    @staticmethod
-    def __decode_004(ssm: int, data: int) -> float | None:
-        if ssm == 1:
-            return None
-        pwr = ((data & 0x0F) + ((data >> 4) & 0x0F) * 10 + ((data >> 8) & 0x0F) * 100 + ((data >> 12) & 0x0F) * 1000 + ((data >> 16) & 0x07) * 10000) / 100
-        if ssm == 3:
-            pwr = -pwr
-        return pwr
-
-    @staticmethod
-    def __encode_005(flag: bool) -> (int, int):
-        if flag is None:
-            return 1, 0
-        ssm = 0
-        flag_bits = flag & 1
-
-        return ssm, flag_bits
-
-    @staticmethod
-    def __decode_005(ssm: int, data: int) -> float | None:
-        if ssm == 1:
-            return None
-
-        flag = bool(data & 1)
-
-        return flag
-
-    __encodes = [__encode_001, __encode_002, __encode_003, __encode_004, __encode_005]
-    __decodes = [__decode_001, __decode_002, __decode_003, __decode_004, __decode_005]
-
     @staticmethod
     def encode(label: int, sdi: int, *args) -> int:
-        if label - 1 not in range(len(ARINC429.__encodes)):
+        spec = LABELS.get(label)
+        if spec is None:
             return 1
 
-        ssm, data = ARINC429.__encodes[label - 1](*args)
-
-        label_bits = ((label // 100) << 6) | (((label // 10) % 10) << 3) | (label % 10)
-        label_reversed = ARINC429.__reverse_bits(label_bits, 8)
+        ssm, data = spec.encode(*args)
 
-        result = label_reversed << 24
-        result |= ARINC429.__reverse_bits(sdi, 2) << 22
-        result |= ARINC429.__reverse_bits(data, 19) << 3
-        result |= ARINC429.__reverse_bits(ssm, 2) << 1
-
-        result |= ARINC429.__get_parity(result)
-
-        return result
+        return ARINC429.pack(label, sdi, ssm, data)
 
     @staticmethod
     def decode(data: int) -> list:
         if not ARINC429.is_valid(data):
             return [None]
-        ssm = data >> 1 & 0xF
-        data_out = data >> 3 & 0x7FFFF
-        sdi = data >> 22 & 0xF
-        label = data >> 24 & 0xFF
-        ssm = ARINC429.__reverse_bits(ssm, 2)
-        data_out = ARINC429.__reverse_bits(data_out, 19)
-        sdi = ARINC429.__reverse_bits(sdi, 2)
-        label = ARINC429.__reverse_bits(label, 8)
-        label_out = (
-                (label & 0x07) + ((label >> 3) & 0x07) * 10 + ((label >> 6) & 0x03) * 100
-        )
-        if label_out - 1 not in range(len(ARINC429.__decodes)):
+        label_out, sdi, ssm, data_out = ARINC429.unpack(data)
+        spec = LABELS.get(label_out)
+        if spec is None:
             return [None]
 
-        out = ARINC429.__decodes[label_out - 1](ssm, data_out)
+        out = spec.decode(ssm, data_out)
 
         return [label_out, sdi, ssm, out]
+
+    @staticmethod
+    def decode_into(word: int, record: DecodedWord) -> bool:
+        """Decode `word` into `record` without allocating a result; False (record untouched) if it is invalid."""
+        if ARINC429.__get_parity(word >> 1) != word & 1:
+            return False
+        spec = LABELS.get(WIRE_TO_LABEL[word >> 24 & 0xFF])
+        if spec is None:
+            return False
+        record.label = spec.number
+        record.sdi = REVERSED_2[word >> 22 & 3]
+        record.ssm = ssm = REVERSED_2[word >> 1 & 3]
+        spec.decode_into(ssm, reverse_19(word >> 3 & 0x7FFFF), record)
+        return True
@@ -0,0 +1,151 @@
+"""asyncio engine of CalculatorServer: every client served from one event loop instead of one thread each.
+
+Only loaded when this engine runs, from CalculatorServer.start_async or a
+prefork worker, so that the threaded server never imports asyncio.
+"""
+import asyncio
+import socket
+
+from calculator import ClientSession
+from metrics import unsent_bytes
+
+
+def run(server, drain_timeout=5.0):
+    """Serve the clients of `server` until `server.stop` is called or the process is interrupted."""
+    try:
+        asyncio.run(serve(server, drain_timeout))
+    except KeyboardInterrupt:
+        print("Shutting down server...")
+    finally:
+        server.server_socket.close()
+        server.close_recorder()
+
+
+async def serve(server, drain_timeout=5.0):
+    """Accept clients until `server.stop` is called, then drain the open connections."""
+    server.loop = asyncio.get_running_loop()
+    server.stopping = asyncio.Event()
+    server.server_socket.setblocking(False)
+    listener = await server.loop.create_server(
+        lambda: CalculatorProtocol(server), sock=server.server_socket, backlog=server.backlog
+    )
+    try:
+        await server.stopping.wait()
+    finally:
+        listener.close()
+        await drain_connections(server, drain_timeout)
+
+
+async def drain_connections(server, timeout):
+    """Stop reading from every client and close it once its pending responses are sent."""
+    for protocol in list(server.connections):
+        protocol.transport.pause_reading()
+        protocol.cancel_tick()
+        protocol.flush()
+        protocol.transport.close()  # The transport flushes its write buffer before closing
+    deadline = server.loop.time() + timeout
+    while server.connections and server.loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    for protocol in list(server.connections):
+        protocol.transport.abort()
+
+
+class CalculatorProtocol(asyncio.BufferedProtocol):
+    """asyncio connection handler running the same ClientSession logic as CalculatorServer.handle_client."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.session = None
+        self.flush_handle = None
+        self.tick_handle = None
+        self.paused = False  # Set while the transport's write buffer is over its high-water mark
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.session = ClientSession(transport.get_extra_info("peername"), self.server.recorder, self.server.metrics,
+                                     self.server.pool, self.server.bus)
+        self.server.connections.add(self)
+        self.server.sessions[self.session.session_id] = self.session
+        self.session.hangup = self.hang_up
+        if self.server.metrics is not None:
+            self.server.metrics.session_opened()
+        print(f"Client connected: {self.session.address}")
+
+    def get_buffer(self, sizehint):
+        return self.session.decoder.get_buffer()
+
+    def buffer_updated(self, nbytes):
+        try:
+            self.session.receive(nbytes)
+        except Exception as e:
+            print(f"Error with client {self.session.address}: {str(e)}")
+            if self.server.metrics is not None:
+                self.server.metrics.connection_errors += 1
+            self.transport.close()
+            return
+        if self.session.next_tick is not None and self.tick_handle is None:
+            self.tick_handle = self.server.loop.call_at(self.session.next_tick, self.on_tick)
+        self.schedule_flush()
+
+    def on_tick(self):
+        """Scheduled simulation step: push the telemetry and book the next tick."""
+        if self.paused:
+            self.session.skip_ticks(self.server.loop.time())
+        else:
+            self.session.run_due_ticks(self.server.loop.time())
+        self.tick_handle = self.server.loop.call_at(self.session.next_tick, self.on_tick)
+        self.schedule_flush()
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+
+    def hang_up(self):
+        self.cancel_tick()
+        self.transport.close()
+
+    def cancel_tick(self):
+        if self.tick_handle is not None:
+            self.tick_handle.cancel()
+            self.tick_handle = None
+
+    def schedule_flush(self):
+        if self.session.outgoing and self.flush_handle is None:
+            if self.server.flush_interval > 0:
+                self.flush_handle = self.server.loop.call_later(self.server.flush_interval, self.flush)
+            else:
+                self.flush()
+
+    def flush(self):
+        """Write every queued response in one call."""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.session.outgoing and not self.transport.is_closing():
+            output = self.session.take_output()
+            if self.server.metrics is not None:
+                sock = self.transport.get_extra_info("socket")
+                self.server.metrics.backlog.observe(len(output) + self.transport.get_write_buffer_size()
+                                                    + unsent_bytes(sock))
+            self.transport.write(output)
+
+    def eof_received(self):
+        """The client shut down its sending side: send what is still queued, then close."""
+        self.cancel_tick()
+        self.flush()
+        return False
+
+    def connection_lost(self, exc):
+        self.cancel_tick()
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        self.server.connections.discard(self)
+        self.session.close()
+        self.server.sessions.pop(self.session.session_id, None)
+        if self.server.metrics is not None:
+            self.server.metrics.session_closed()
+        print(f"Client disconnected: {self.session.address}")
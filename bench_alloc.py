@@ -0,0 +1,70 @@
+"""Memory allocated per word on the server's decode path.
+
+python bench_alloc.py [n_words] decodes the words with ARINC429.decode,
+ARINC429.decode_into and Calculator.process_data, keeping every result,
+and prints per word the objects (blocks, from sys.getallocatedblocks)
+and bytes (from tracemalloc) left allocated, plus the bytes each
+Calculator instance holds. Results are kept so that CPython's free lists
+cannot hide the short-lived lists, tuples and floats a call creates.
+decode_into fills one reused DecodedWord, so it allocates nothing.
+process_data runs with ticks driving the steps, as under the GUI: the
+setpoints answer with a shared empty tuple, and only the power and mode
+echoes (labels 4 and 5) still allocate their response list and word.
+"""
+import argparse
+import sys
+import tracemalloc
+
+from arinc429 import ARINC429, DecodedWord
+from bench_codec import sample_values
+from calculator import Calculator
+
+
+def allocated_per_call(function, words) -> (float, float):
+    """(blocks, bytes) allocated by each `function(word)` and still referenced by its result."""
+    kept = [None] * len(words)
+    blocks = sys.getallocatedblocks()
+    size = tracemalloc.get_traced_memory()[0]
+    for i, word in enumerate(words):
+        kept[i] = function(word)
+    return ((sys.getallocatedblocks() - blocks) / len(words),
+            (tracemalloc.get_traced_memory()[0] - size) / len(words))
+
+
+def bytes_per_instance(factory, n: int) -> float:
+    """Bytes retained by each of `n` objects built by `factory()`."""
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory() for _ in range(n)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    return (size - sys.getsizeof(objects)) / len(objects)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Allocations of the ARINC429 decode path")
+    parser.add_argument("n", type=int, nargs="?", default=20_000, help="words per measurement")
+    args = parser.parse_args()
+
+    words = [ARINC429.encode(*v) for v in sample_values(args.n)]
+    record = DecodedWord()
+    calculator = Calculator()
+    calculator.step_on_input = False  # Setpoints only, as with server-driven ticks
+    functions = {
+        "decode": ARINC429.decode,
+        "decode_into": lambda word: ARINC429.decode_into(word, record),
+        "process_data": lambda word: calculator.process_data(word, record),
+    }
+
+    tracemalloc.start()
+    results = {name: allocated_per_call(function, words) for name, function in functions.items()}
+    instance = bytes_per_instance(Calculator, 1000)
+    tracemalloc.stop()
+
+    print(f"{'per word':14}{'blocks':>8}{'bytes':>8}")
+    for name, (blocks, size) in results.items():
+        print(f"{name:14}{blocks:>8.2f}{size:>8.1f}")
+    print(f"{'Calculator':14}{instance:>8.1f} bytes per instance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Benchmark of the ARINC429 word codec.
+
+python bench_codec.py [n_words] prints the throughput of every codec
+operation, label encoders and decoders included. --baseline PATH --save
+stores the results; a later run with --baseline PATH compares against
+them and exits with status 1 when an operation got slower than
+--threshold, so it can gate changes to the codec. Before measuring, it
+checks the codec against the reference implementation below, and the
+stream decoder against the same stream split at every byte offset.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from arinc429 import ARINC429, DecodedWord, LABELS
+from protocol import BINARY, HELLO, MUX, WordStreamDecoder, format_options, pack_frames, pack_words
+
+
+# Original bit-loop implementation, kept as reference for equivalence and speed
+def legacy_parity(x: int) -> int:
+    result = 0
+    while x:
+        result ^= x & 1
+        x >>= 1
+    return result ^ 1
+
+
+def legacy_reverse_bits(x: int, num_bits: int) -> int:
+    return sum(((x >> i) & 1) << (num_bits - 1 - i) for i in range(num_bits))
+
+
+def legacy_is_valid(x: int) -> bool:
+    return legacy_parity(x >> 1) == x & 1
+
+
+def legacy_pack(label: int, sdi: int, ssm: int, data: int) -> int:
+    label_bits = ((label // 100) << 6) | (((label // 10) % 10) << 3) | (label % 10)
+    result = legacy_reverse_bits(label_bits, 8) << 24
+    result |= legacy_reverse_bits(sdi, 2) << 22
+    result |= legacy_reverse_bits(data, 19) << 3
+    result |= legacy_reverse_bits(ssm, 2) << 1
+    result |= legacy_parity(result)
+    return result
+
+
+def legacy_unpack(word: int) -> (int, int, int, int):
+    label = legacy_reverse_bits(word >> 24 & 0xFF, 8)
+    label_out = (label & 0x07) + ((label >> 3) & 0x07) * 10 + ((label >> 6) & 0x03) * 100
+    return (
+        label_out,
+        legacy_reverse_bits(word >> 22 & 0xF, 2),
+        legacy_reverse_bits(word >> 1 & 0xF, 2),
+        legacy_reverse_bits(word >> 3 & 0x7FFFF, 19),
+    )
+
+
+# Operating limits of each label, mixed into the samples to cover the widest fields
+LIMITS = {1: (-40000, 0, 40000), 2: (-800, 800), 3: (-16, 16), 4: (0, 100)}
+
+
+def sample_values(n: int, seed: int = 0) -> list:
+    """Representative (label, sdi, *args) tuples for ARINC429.encode, limits included."""
+    rng = random.Random(seed)
+    states = (ARINC429.ON_GROUND, ARINC429.ALTITUDE_CHANGE, ARINC429.CRUISE)
+    values = []
+    for i in range(n):
+        label = i % 5 + 1
+        sdi = rng.randint(0, 3)
+        limit = rng.choice(LIMITS[label]) if label in LIMITS and rng.random() < 0.05 else None
+        if label == 1:
+            values.append((label, sdi, limit if limit is not None else rng.uniform(-40000, 40000), rng.choice(states)))
+        elif label == 2:
+            values.append((label, sdi, limit if limit is not None else round(rng.uniform(-800, 800), 1)))
+        elif label == 3:
+            values.append((label, sdi, limit if limit is not None else round(rng.uniform(-16, 16), 1)))
+        elif label == 4:
+            values.append((label, sdi, limit if limit is not None else round(rng.uniform(0, 100), 2)))
+        else:
+            values.append((label, sdi, rng.random() < 0.5))
+    return values
+
+
+def feed(decoder: WordStreamDecoder, chunks) -> list:
+    """Words decoded from `chunks`, each one handed to the decoder as a separate read."""
+    words = []
+    for chunk in chunks:
+        decoder.get_buffer()[:len(chunk)] = chunk
+        words += decoder.consume(len(chunk))
+    return words
+
+
+def split_stream_mismatches(words: list) -> list:
+    """Names of the streams WordStreamDecoder decodes differently when split in two reads at some byte offset."""
+    frames = [(i % 3, word) for i, word in enumerate(words)]
+    streams = {  # Name -> (stream, decoder arguments, expected words)
+        "text": (pack_words(words), {"handshake": True}, words),
+        "binary handshake": (format_options(HELLO, {BINARY: ""}) + pack_words(words, True), {"handshake": True}, words),
+        "mux handshake": (format_options(HELLO, {MUX: ""}) + b"".join(pack_frames(c, [w]) for c, w in frames),
+                          {"handshake": True}, frames),
+        "binary": (pack_words(words, True), {"binary": True}, words),
+    }
+    mismatches = []
+    for name, (stream, arguments, expected) in streams.items():
+        if feed(WordStreamDecoder(**arguments), [stream]) != expected:
+            mismatches.append(name)
+            continue
+        for offset in range(1, len(stream)):
+            try:
+                matches = feed(WordStreamDecoder(**arguments), [stream[:offset], stream[offset:]]) == expected
+            except ValueError:  # A word or handshake cut in two and read as garbage
+                matches = False
+            if not matches:
+                mismatches.append(f"{name} split at byte {offset}")
+                break
+    return mismatches
+
+
+def rate(func, items, repeat: int = 3) -> float:
+    """Best-of-`repeat` throughput of `func(*item)` in calls per second."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(*item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def label_rates(values: list, repeat: int) -> dict:
+    """Throughput of every registered label encoder and decoder over its share of `values`."""
+    results = {}
+    for number, spec in LABELS.items():
+        args = [v[2:] for v in values if v[0] == number]
+        if not args:
+            continue
+        fields = [spec.encode(*a) for a in args]
+        results[f"label_{number:03d}.encode"] = rate(spec.encode, args, repeat)
+        results[f"label_{number:03d}.decode"] = rate(spec.decode, fields, repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print results against the baseline; return the names slower than it by more than `threshold`."""
+    regressions = []
+    print(f"{'':22}{'baseline':>14}{'current':>14}{'change':>9}")
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        change = current / baseline[name] - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:22}{baseline[name]:>14,.0f}{current:>14,.0f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="ARINC429 codec benchmark")
+    parser.add_argument("n", type=int, nargs="?", default=100_000, help="words per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is kept")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON baseline to compare with")
+    parser.add_argument("--save", action="store_true", help="write the results to --baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="fail when an operation is this fraction slower than the baseline")
+    args = parser.parse_args()
+
+    n, repeat = args.n, args.repeat
+    values = sample_values(n)
+    words = [ARINC429.encode(*v) for v in values]
+    fields = [ARINC429.unpack(w) for w in words]
+    single = [(w,) for w in words]
+    record = DecodedWord()
+
+    for w, f in zip(words, fields):
+        if legacy_pack(*f) != w or legacy_unpack(w) != f or legacy_is_valid(w) != ARINC429.is_valid(w):
+            print(f"Mismatch with the reference codec for word {w}")
+            return 1
+    print(f"{n} words bit-identical to the reference codec")
+    mismatches = split_stream_mismatches(words[:60])
+    if mismatches:
+        print(f"WordStreamDecoder output changes with the read boundaries: {', '.join(mismatches)}")
+        return 1
+    print("Stream decoder output independent of the read boundaries")
+
+    results = {
+        "pack": rate(ARINC429.pack, fields, repeat),
+        "unpack": rate(ARINC429.unpack, single, repeat),
+        "is_valid": rate(ARINC429.is_valid, single, repeat),
+        "encode": rate(ARINC429.encode, values, repeat),
+        "decode": rate(ARINC429.decode, single, repeat),
+        "decode_into": rate(ARINC429.decode_into, [(w, record) for w in words], repeat),
+    }
+    print(f"{'':10}{'reference':>14}{'tables':>14}{'speedup':>10}")
+    for name, old in (("pack", rate(legacy_pack, fields, repeat)), ("unpack", rate(legacy_unpack, single, repeat)),
+                      ("is_valid", rate(legacy_is_valid, single, repeat))):
+        print(f"{name:10}{old:>14,.0f}{results[name]:>14,.0f}{results[name] / old:>9.1f}x")
+    results.update(label_rates(values, repeat))
+
+    try:
+        import numpy as np
+        from arinc429_batch import decode_batch, encode_batch
+    except ImportError:
+        np = None
+    if np is not None:
+        columns = (
+            np.array([v[0] for v in values]),
+            np.array([v[1] for v in values]),
+            np.array([float(v[2]) for v in values]),
+            np.array([v[3] if len(v) > 3 else -1 for v in values]),
+        )
+        batch = np.array(words, dtype=np.uint32)
+        if not np.array_equal(encode_batch(*columns), batch):
+            print("Mismatch between encode_batch and ARINC429.encode")
+            return 1
+        results["encode_batch"] = rate(encode_batch, [columns], repeat) * n
+        results["decode_batch"] = rate(decode_batch, [(batch,)], repeat) * n
+
+    for name in results:
+        if name not in ("pack", "unpack", "is_valid"):
+            print(f"{name}: {results[name]:,.0f} words/s")
+
+    if args.baseline is None:
+        return 0
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump({"n": n, "python": platform.python_version(), "results": results}, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("n") != n:
+        print(f"The baseline was measured with n={baseline.get('n')}, not {n}: run again with the same n")
+        return 1
+    if baseline.get("python") != platform.python_version():
+        print(f"Warning: the baseline was measured with Python {baseline.get('python')}, "
+              f"this is {platform.python_version()}")
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} operations more than {args.threshold:.0%} slower than the baseline: "
+              + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Load test of CalculatorServer with simulated cockpit clients.
+
+Starts the server in a subprocess for each mode to compare, connects N
+binary clients that send a mix of setpoints at a target rate, and reports
+the throughput, the round-trip latency percentiles and the server CPU and
+memory (python bench_server.py --clients 50 --rate 100 --modes thread asyncio prefork).
+
+Latency is measured from the time each setpoint was due, not when it was
+actually sent, so a saturated server shows up as latency instead of a
+lower sending rate. Every client mirrors the session in a local Calculator
+to know how many response words each setpoint produces; that costs about
+as much as the server itself, so the clients are spread over several
+processes (--client-processes) to keep the load generator out of the way.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from arinc429 import ARINC429
+from calculator import Calculator
+from protocol import ACK, BINARY, HELLO, WORD_SIZE, format_options, pack_words, parse_options
+
+PERCENTILES = (50, 95, 99, 99.9)
+STATES = (ARINC429.ON_GROUND, ARINC429.ALTITUDE_CHANGE, ARINC429.CRUISE)
+
+
+def setpoint(rng: random.Random, auto: bool) -> (int, bool):
+    """Random setpoint word and the resulting mode: mostly altitude, climb, angle and power, some mode switches."""
+    kind = rng.random()
+    if kind < 0.3:
+        return ARINC429.encode(1, 0, rng.randrange(0, 40000, 100), rng.choice(STATES)), auto
+    if kind < 0.5:
+        return ARINC429.encode(2, 0, round(rng.uniform(-800, 800), 1)), auto
+    if kind < 0.7:
+        return ARINC429.encode(3, 0, round(rng.uniform(-16, 16), 1)), auto
+    if kind < 0.95:
+        return ARINC429.encode(4, 0, round(rng.uniform(0, 100), 2)), auto
+    return ARINC429.encode(5, 0, not auto), not auto
+
+
+class ProcessStats:
+    """CPU time and memory of a process and its children, read from /proc (Linux only)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def pids(self) -> list:
+        pids = [self.pid]
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children") as file:
+                    pids += [int(child) for child in file.read().split()]
+            except OSError:
+                pass
+        return pids
+
+    def cpu_time(self) -> float:
+        """User plus system seconds used so far."""
+        ticks = 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/stat") as file:
+                    fields = file.read().rpartition(")")[2].split()
+            except OSError:
+                continue
+            ticks += int(fields[11]) + int(fields[12])
+        return ticks / os.sysconf("SC_CLK_TCK")
+
+    def memory(self) -> (int, int):
+        """Current and peak resident set size in bytes."""
+        rss = peak = 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/status") as file:
+                    for line in file:
+                        if line.startswith("VmRSS:"):
+                            rss += int(line.split()[1]) * 1024
+                        elif line.startswith("VmHWM:"):
+                            peak += int(line.split()[1]) * 1024
+            except OSError:
+                pass
+        return rss, peak
+
+
+class LoadClient:
+    """One cockpit connection sending setpoints on a fixed schedule and timing the responses."""
+
+    def __init__(self, index: int, port: int, rate: float, seed: int, window: (float, float)):
+        self.port = port
+        self.period = 1 / rate
+        self.window = window  # time.monotonic() interval measured; setpoints due in it are timed
+        self.rng = random.Random(seed * 100_003 + index)
+        self.auto = self.rng.random() < 0.5
+        self.mirror = Calculator()
+        self.pending = []  # [due time, response words still expected] per setpoint, oldest first
+        self.latencies = []
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+
+    async def run(self, stop: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer.write(format_options(HELLO, {BINARY: ""}))
+        if parse_options(ACK, await reader.readline()) is None:
+            raise ConnectionError("the server refused the binary handshake")
+        receiver = asyncio.create_task(self.receive(reader, loop))
+
+        due = loop.time() + self.rng.random() * self.period  # Spread the clients over one period
+        first = ARINC429.encode(5, 0, self.auto)
+        try:
+            while not stop.is_set():
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if first is not None:
+                    word, first = first, None
+                else:
+                    word, self.auto = setpoint(self.rng, self.auto)
+                try:
+                    expected = len(self.mirror.process_data(word))
+                except ValueError:
+                    # The server fails on the same setpoint and drops the connection
+                    self.errors += 1
+                    break
+                self.pending.append([due, expected])
+                writer.write(pack_words([word], True))
+                if self.window[0] <= due < self.window[1]:
+                    self.sent += 1
+                due += self.period
+        finally:
+            writer.close()
+            receiver.cancel()
+
+    async def receive(self, reader, loop):
+        remainder = 0
+        while data := await reader.read(1 << 16):
+            now = loop.time()
+            words, remainder = divmod(remainder + len(data), WORD_SIZE)
+            if self.window[0] <= now < self.window[1]:
+                self.received += words
+            while words and self.pending:
+                request = self.pending[0]
+                taken = min(words, request[1])
+                request[1] -= taken
+                words -= taken
+                if request[1] == 0:
+                    self.pending.pop(0)
+                    if self.window[0] <= request[0] < self.window[1]:
+                        self.latencies.append(now - request[0])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int, workers: int, flush_us: int) -> subprocess.Popen:
+    here = os.path.dirname(os.path.abspath(__file__))
+    if mode == "prefork":
+        command = ["prefork.py", "--workers", str(workers)]
+    else:
+        command = ["calculator.py", "--mode", mode]
+    command += ["--port", str(port), "--backlog", "1024", "--flush-us", str(flush_us)]
+    server = subprocess.Popen([sys.executable] + command, cwd=here, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def run_clients(port: int, indices: range, rate: float, seed: int, window: (float, float)) -> dict:
+    """Run the clients `indices` until the end of the window (plus a grace period for late responses)."""
+    stop = asyncio.Event()
+    clients = [LoadClient(i, port, rate, seed, window) for i in indices]
+    tasks = [asyncio.create_task(client.run(stop)) for client in clients]
+    await asyncio.sleep(window[1] - time.monotonic())
+    await asyncio.sleep(min(window[1] - window[0], 1.0))
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "sent": sum(c.sent for c in clients),
+        "received": sum(c.received for c in clients),
+        "errors": sum(c.errors for c in clients),
+        "latencies": [latency for c in clients for latency in c.latencies],
+    }
+
+
+def client_process(port: int, indices: range, rate: float, seed: int, window: (float, float)) -> dict:
+    return asyncio.run(run_clients(port, indices, rate, seed, window))
+
+
+def load(port: int, args, stats: ProcessStats) -> dict:
+    """Apply the load from `args.client_processes` processes and measure the server during the window."""
+    start = time.monotonic() + args.warmup
+    window = (start, start + args.duration)
+    processes = min(args.client_processes, args.clients)
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(client_process, port, range(p, args.clients, processes), args.rate, args.seed, window)
+                   for p in range(processes)]
+        time.sleep(max(window[0] - time.monotonic(), 0))
+        cpu = stats.cpu_time()
+        time.sleep(max(window[1] - time.monotonic(), 0))
+        cpu = stats.cpu_time() - cpu
+        rss, peak = stats.memory()
+        parts = [future.result() for future in futures]
+
+    latencies = np.array([latency for part in parts for latency in part["latencies"]]) * 1e6
+    return {
+        "requests_per_s": sum(part["sent"] for part in parts) / args.duration,
+        "words_per_s": sum(part["received"] for part in parts) / args.duration,
+        "completed": len(latencies),
+        "errors": sum(part["errors"] for part in parts),
+        "latency_us": {f"p{p:g}": float(np.percentile(latencies, p)) if len(latencies) else None
+                       for p in PERCENTILES},
+        "cpu_percent": 100 * cpu / args.duration,
+        "rss_mb": rss / 2 ** 20,
+        "peak_rss_mb": peak / 2 ** 20,
+    }
+
+
+def run_mode(mode: str, args) -> dict:
+    port = free_port()
+    server = start_server(mode, port, args.workers, args.flush_us)
+    try:
+        return load(port, args, ProcessStats(server.pid))
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test of the ARINC 429 calculator server")
+    parser.add_argument("--modes", nargs="+", choices=("thread", "asyncio", "prefork"), default=["thread", "asyncio"])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=50, help="setpoints per second and per client")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="prefork worker processes")
+    parser.add_argument("--client-processes", type=int, default=max(os.cpu_count() // 2, 1),
+                        help="processes the clients are spread over")
+    parser.add_argument("--flush-us", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients x {args.rate:g} setpoints/s, {args.duration:g} s per mode")
+    header = f"{'mode':10}{'req/s':>10}{'words/s':>10}" + "".join(f"{f'p{p:g} us':>11}" for p in PERCENTILES)
+    print(header + f"{'cpu %':>8}{'rss MB':>9}{'errors':>8}")
+    results = {}
+    for mode in args.modes:
+        result = results[mode] = run_mode(mode, args)
+        latency = "".join(f"{v:>11,.0f}" if v is not None else f"{'-':>11}" for v in result["latency_us"].values())
+        print(f"{mode:10}{result['requests_per_s']:>10,.0f}{result['words_per_s']:>10,.0f}{latency}"
+              f"{result['cpu_percent']:>8.1f}{result['rss_mb']:>9.1f}{result['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"config": vars(args), "results": results}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Cold-start benchmark of the server: how long importing CalculatorServer takes in a fresh interpreter.
+
+python bench_startup.py [--runs 15] [--budget 120] imports the server in
+new processes, prints the median and best import times, and exits with
+status 1 when the median goes over the budget (milliseconds) or when a
+heavy module the server must not need (NumPy, matplotlib) gets loaded.
+--detail lists the slowest imports reported by python -X importtime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("numpy", "matplotlib")
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from {module} import {name}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def import_once(module: str, name: str) -> dict:
+    """Import `name` from `module` in a new interpreter; return its import time and the heavy modules loaded."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = PROBE.format(module=module, name=name, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def slowest_imports(module: str, count: int) -> list:
+    """(cumulative microseconds, module) of the `count` slowest imports under python -X importtime."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=here,
+                            capture_output=True, text=True, check=True)
+    times = []
+    for line in output.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times.append((int(fields[1]), fields[2].rstrip()))
+    return sorted(times, reverse=True)[:count]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cold-start import time of the calculator server")
+    parser.add_argument("--runs", type=int, default=15, help="fresh interpreters to measure")
+    parser.add_argument("--budget", type=float, default=120, help="median import time allowed, in milliseconds")
+    parser.add_argument("--target", default="calculator:CalculatorServer", help="module:name to import")
+    parser.add_argument("--detail", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    args = parser.parse_args()
+
+    module, name = args.target.split(":")
+    import_once(module, name)  # Compile the modules and warm the file cache first
+    runs = [import_once(module, name) for _ in range(args.runs)]
+    times = [run["seconds"] * 1000 for run in runs]
+    median = statistics.median(times)
+    loaded = sorted({m for run in runs for m in run["loaded"]})
+    print(f"{args.target}: median {median:.1f} ms, best {min(times):.1f} ms over {args.runs} runs "
+          f"(budget {args.budget:g} ms)")
+
+    for cumulative, imported in slowest_imports(module, args.detail):
+        print(f"{cumulative / 1000:>8.1f} ms  {imported}")
+
+    failed = False
+    if loaded:
+        print(f"Heavy modules loaded at startup: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"Over budget by {median - args.budget:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
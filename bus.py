@@ -0,0 +1,144 @@
+"""UDP bus: tick telemetry published once, received by any number of listeners.
+
+ARINC 429 has one transmitter and many receivers per bus. CalculatorServer
+(--bus 239.42.9.1:42900) publishes the telemetry of each tick of the
+sessions that asked for it as one datagram on a multicast group, or on a
+broadcast address, so GUIs, recorders and monitors cost the server nothing
+per listener. Datagrams carry the session as source and a sequence number
+per source, from which BusListener counts the lost ones. Monitor a bus
+with python bus.py 239.42.9.1:42900 [--record PATH].
+"""
+import argparse
+import ipaddress
+import socket
+import struct
+import time
+
+from arinc429 import ARINC429
+from protocol import unpack_datagram
+
+DEFAULT_GROUP = "239.42.9.1"  # Administratively scoped multicast: never routed off site
+DEFAULT_PORT = 42900
+LATE_WINDOW = 1024  # Datagrams a reordered one may lag behind; further back, its source was restarted
+
+
+def parse_address(text: str) -> (str, int):
+    """(group, port) of a ``group[:port]`` argument."""
+    group, _, port = text.partition(":")
+    return group or DEFAULT_GROUP, int(port or DEFAULT_PORT)
+
+
+def is_multicast(group: str) -> bool:
+    return ipaddress.ip_address(group).is_multicast
+
+
+class BusTransmitter:
+    """Send datagrams to a multicast group or broadcast address; shareable between threads."""
+
+    def __init__(self, group=DEFAULT_GROUP, port=DEFAULT_PORT, interface="127.0.0.1", ttl=1):
+        self.address = (group, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if is_multicast(group):
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)  # Listeners on this host too
+        else:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sent = 0
+        self.errors = 0  # Datagrams the kernel refused (no route, buffer full); the bus is lossy anyway
+
+    def send(self, datagram: bytes):
+        try:
+            self.sock.sendto(datagram, self.address)
+            self.sent += 1
+        except OSError:
+            self.errors += 1
+
+    def close(self):
+        self.sock.close()
+
+
+class BusListener:
+    """Receive the datagrams of a bus and count, per source, those lost or arriving late."""
+
+    def __init__(self, group=DEFAULT_GROUP, port=DEFAULT_PORT, interface="127.0.0.1"):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Several listeners of one host share the port
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.sock.bind(("", port))
+        if is_multicast(group):
+            membership = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(interface))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        self.expected = {}  # Source -> next sequence number
+        self.received = 0
+        self.lost = 0  # Datagrams skipped by the sequence numbers
+        self.late = 0  # Duplicated or reordered datagrams, dropped
+        self.invalid = 0  # Datagrams that are not from a calculator
+
+    def receive(self, timeout=None) -> tuple | None:
+        """Wait for the next datagram in sequence; return its (source, words), None on timeout."""
+        self.sock.settimeout(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                return None
+            try:
+                source, sequence, words = unpack_datagram(data)
+            except ValueError:
+                self.invalid += 1
+            else:
+                expected = self.expected.get(source)
+                gap = 0 if expected is None else (sequence - expected) & 0xFFFFFFFF
+                if gap >= 1 << 31 and (expected - sequence) & 0xFFFFFFFF > LATE_WINDOW:
+                    gap = 0  # A new session reusing the id of an old one
+                if gap < 1 << 31:
+                    self.lost += gap
+                    self.expected[source] = (sequence + 1) & 0xFFFFFFFF
+                    self.received += 1
+                    return source, words
+                self.late += 1
+            if deadline is not None:
+                self.sock.settimeout(max(deadline - time.monotonic(), 1e-3))
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the telemetry of an ARINC 429 UDP bus")
+    parser.add_argument("address", nargs="?", default=f"{DEFAULT_GROUP}:{DEFAULT_PORT}", help="group[:port]")
+    parser.add_argument("--interface", default="127.0.0.1", help="address of the interface to join the group on")
+    parser.add_argument("--record", metavar="PATH", help="append the words received to this bus recording")
+    parser.add_argument("--quiet", action="store_true", help="only print the loss statistics")
+    args = parser.parse_args()
+
+    recorder = None
+    if args.record:
+        from recorder import BusRecorder, FROM_CALCULATOR
+        recorder = BusRecorder(args.record)
+    listener = BusListener(*parse_address(args.address), args.interface)
+    print(f"Listening on {args.address}")
+    report = time.monotonic() + 1
+    try:
+        while True:
+            result = listener.receive(timeout=1)
+            if result is not None:
+                source, words = result
+                if recorder is not None:
+                    recorder.record(source, FROM_CALCULATOR, words)
+                if not args.quiet:
+                    print(source, [ARINC429.decode(word) for word in words])
+            if time.monotonic() >= report:
+                report += 1
+                print(f"{listener.received} datagrams, {listener.lost} lost, {listener.late} late, "
+                      f"{listener.invalid} invalid")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if recorder is not None:
+            recorder.close()
@@ -1,12 +1,39 @@
+import argparse
+import itertools
+import math
+import signal
 import socket
 import threading
+import time
 
-import numpy as np
+from arinc429 import ARINC429, DecodedWord
+from metrics import Metrics, serve_metrics, unsent_bytes
+from protocol import (ACK, BINARY, BUS, DELTA, MUX, SESSION, TICK, format_options, pack_datagram, pack_frames,
+                      pack_words, WordStreamDecoder)
+from recorder import BusRecorder, FROM_CALCULATOR, STEP, TO_CALCULATOR
+from session_pool import SessionPool
 
-from arinc429 import ARINC429
+NO_RESPONSE = ()  # Answer of the setpoints that do not step: shared, so that they allocate nothing
+
+# One simulation step per row; climb is in ft per step, as in Calculator.climb
+TRAJECTORY_FIELDS = [
+    ("altitude", "f8"),
+    ("climb", "f8"),
+    ("angle", "f8"),
+    ("power", "f8"),
+    ("state", "i1"),
+]
+
+
+def asin(x: float) -> float:
+    """math.asin returning NaN outside [-1, 1], as numpy.arcsin does, instead of raising."""
+    return math.asin(x) if -1 <= x <= 1 else math.nan
 
 
 class Calculator:
+    __slots__ = ("state", "altitude", "power", "desired_power", "climb", "angle", "desired_angle", "desired_climb",
+                 "desired_altitude", "auto", "step_on_input", "metrics")
+
     def __init__(self):
         self.state = ARINC429.ON_GROUND
         self.altitude = 0
@@ -18,6 +45,8 @@ class Calculator:
         self.desired_climb = 0
         self.desired_altitude = 40000
         self.auto = True  # Nouveau flag : True = mode automatique, False = manuel
+        self.step_on_input = True  # False when a scheduler drives angle_rise instead of the setpoints
+        self.metrics = None  # Metrics counting the words processed, if any
 
     def validate_inputs(self):
         if not (0 <= self.desired_power <= 100):
@@ -31,6 +60,18 @@ class Calculator:
             self.desired_climb = max(-800 / 60, min(self.desired_climb, 800 / 60))
 
     def angle_rise(self) -> list:
+        if not self.step():
+            return [ARINC429.encode(1, 0, 0, ARINC429.ON_GROUND)]
+
+        return [
+            ARINC429.encode(1, 0, self.altitude, self.state),
+            ARINC429.encode(2, 0, 60 * self.climb),
+            ARINC429.encode(3, 0, self.angle),
+            ARINC429.encode(4, 0, self.power)
+        ]
+
+    def step(self) -> bool:
+        """Advance the simulation once; False when an idle manual aircraft only reports it is on the ground."""
         self.validate_inputs()
 
         # MODE AUTOMATIQUE
@@ -51,8 +92,8 @@ class Calculator:
                     angle = max(diff / 100, -16)
                 else:
                     angle = min(diff / 100, 16)
-                angle = np.deg2rad(angle)
-                climb_rate = V * np.sin(angle)
+                angle = math.radians(angle)
+                climb_rate = V * math.sin(angle)
 
                 if climb_rate < 0:
                     climb_rate = max(climb_rate, -800 / 60)
@@ -64,13 +105,13 @@ class Calculator:
                 self.climb = climb_rate
 
                 if V != 0:
-                    angle = np.arcsin(climb_rate / V)
+                    angle = asin(climb_rate / V)
 
                 new_altitude = self.altitude + climb_rate
                 climb_rate *= 60
                 self.altitude = new_altitude
                 new_state = ARINC429.ALTITUDE_CHANGE
-                self.angle = np.rad2deg(angle)
+                self.angle = math.degrees(angle)
             else:
                 if abs(self.altitude) < 1:
                     new_state = ARINC429.ON_GROUND
@@ -84,13 +125,7 @@ class Calculator:
                 self.angle = 0
 
             self.state = new_state
-
-            return [
-                ARINC429.encode(1, 0, self.altitude, self.state),
-                ARINC429.encode(2, 0, 60 * self.climb),
-                ARINC429.encode(3, 0, self.angle),
-                ARINC429.encode(4, 0, self.power)
-            ]
+            return True
         # MODE MANUEL
         if self.state == ARINC429.ON_GROUND:
             if self.desired_climb != 0 and self.desired_angle != 0:
@@ -103,7 +138,7 @@ class Calculator:
                     self.desired_angle = 10
                 self.state = ARINC429.ALTITUDE_CHANGE
             else:
-                return [ARINC429.encode(1, 0, 0, ARINC429.ON_GROUND)]
+                return False
 
         diff = self.desired_altitude - self.altitude
         if abs(diff) > 0.1:
@@ -118,10 +153,10 @@ class Calculator:
             self.altitude += self.climb
 
             if abs(self.desired_angle) > 0.1:
-                V = self.climb / np.sin(np.deg2rad(self.desired_angle))
+                V = self.climb / math.sin(math.radians(self.desired_angle))
                 self.power = max(50, min(V / (0.6 / 3.6 * 3.28084), 100))
                 V = self.power * 0.6 / 3.6 * 3.28084
-                self.angle = np.rad2deg(np.arcsin(self.climb / V) if V != 0 else 0)
+                self.angle = math.degrees(asin(self.climb / V) if V != 0 else 0)
         else:
             self.climb = 0
             self.angle = 0
@@ -130,98 +165,401 @@ class Calculator:
             self.altitude = round(self.desired_altitude)
             self.state = ARINC429.CRUISE if self.altitude > 0 else ARINC429.ON_GROUND
 
-        return [
-            ARINC429.encode(1, 0, self.altitude, self.state),
-            ARINC429.encode(2, 0, 60 * self.climb),
-            ARINC429.encode(3, 0, self.angle),
-            ARINC429.encode(4, 0, self.power)
-        ]
-
-    def process_label_001(self, label_out, sdi, ssm, out) -> list:
-        desired_altitude, state = out
-        if state is None or desired_altitude is None:
-            return [ARINC429.encode(label_out, sdi, None, state)]
-
-        self.desired_altitude = desired_altitude
-        return self.angle_rise()
-
-    def process_label_002(self, label_out, sdi, ssm, out) -> list:
-        self.desired_climb = out / 60
-        return self.angle_rise()
-
-    def process_label_003(self, label_out, sdi, ssm, out) -> list:
-        self.desired_angle = out
-        return self.angle_rise()
-
-    def process_label_004(self, label_out, sdi, ssm, out) -> list:
-        self.desired_power = out
-        return [ARINC429.encode(label_out, sdi, self.power)]
-
-    def process_label_005(self, label_out, sdi, ssm, out) -> list:
-        self.auto = bool(out)
-        return [ARINC429.encode(label_out, sdi, self.auto)]
+        return True
+
+    def advance(self, n_steps: int) -> "numpy.ndarray":
+        """Run `n_steps` steps without encoding any word; return the state after each step."""
+        return self.run_until(None, n_steps)
+
+    def run_until(self, predicate, max_steps: int) -> "numpy.ndarray":
+        """Step until `predicate(self)` holds after a step, or `max_steps` steps were run.
+
+        Returns a record array of TRAJECTORY_FIELDS with one row per step taken.
+        """
+        import numpy as np  # Only the trajectory API needs it; the server path stays free of it
+        trajectory = np.empty(max_steps, dtype=TRAJECTORY_FIELDS)
+        altitude, climb, angle, power, state = (trajectory[name] for name, _ in TRAJECTORY_FIELDS)
+        for i in range(max_steps):
+            self.step()
+            altitude[i] = self.altitude
+            climb[i] = self.climb
+            angle[i] = self.angle
+            power[i] = self.power
+            state[i] = self.state
+            if predicate is not None and predicate(self):
+                return trajectory[:i + 1]
+        return trajectory
+
+    def process_label_001(self, word: DecodedWord) -> list | tuple:
+        if word.status is None or word.value is None:
+            return [ARINC429.encode(word.label, word.sdi, None, word.status)]
+
+        self.desired_altitude = word.value
+        return self.angle_rise() if self.step_on_input else NO_RESPONSE
+
+    def process_label_002(self, word: DecodedWord) -> list | tuple:
+        self.desired_climb = word.value / 60
+        return self.angle_rise() if self.step_on_input else NO_RESPONSE
+
+    def process_label_003(self, word: DecodedWord) -> list | tuple:
+        self.desired_angle = word.value
+        return self.angle_rise() if self.step_on_input else NO_RESPONSE
+
+    def process_label_004(self, word: DecodedWord) -> list:
+        self.desired_power = word.value
+        return [ARINC429.encode(word.label, word.sdi, self.power)]
+
+    def process_label_005(self, word: DecodedWord) -> list:
+        self.auto = bool(word.value)
+        return [ARINC429.encode(word.label, word.sdi, self.auto)]
 
     def error(self) -> list:
         return [ARINC429.encode(0, 0, None)]
 
-    def process_data(self, data) -> list:
-        result = ARINC429.decode(data)
-        if result == [None]:
+    def process_data(self, data, word: DecodedWord = None) -> list | tuple:
+        """Respond to one received word, decoded into `word` when the caller reuses one record for every word."""
+        if word is None:
+            word = DecodedWord()
+        if not ARINC429.decode_into(data, word):
             print("Invalid data")
+            if self.metrics is not None:
+                self.metrics.rejected(data)
             return self.error()
 
-        label_out, sdi, ssm, out = result
+        if self.metrics is not None:
+            self.metrics.received[word.label] += 1
 
-        match label_out:
+        match word.label:
             case 1:
-                return self.process_label_001(label_out, sdi, ssm, out)
+                return self.process_label_001(word)
             case 2:
-                return self.process_label_002(label_out, sdi, ssm, out)
+                return self.process_label_002(word)
             case 3:
-                return self.process_label_003(label_out, sdi, ssm, out)
+                return self.process_label_003(word)
             case 4:
-                return self.process_label_004(label_out, sdi, ssm, out)
+                return self.process_label_004(word)
             case 5:
-                return self.process_label_005(label_out, sdi, ssm, out)
+                return self.process_label_005(word)
             case _:
                 return self.error()
 
+
+class ClientSession:
+    """Per-connection state, shared by the threaded and asyncio servers."""
+
+    MIN_TICK_RATE = 1  # Hz
+    MAX_TICK_RATE = 100
+    MAX_CATCH_UP = 10  # Steps run at once when the scheduler is late, before skipping ahead
+    DEFAULT_KEEPALIVE = 1.0  # Seconds before an unchanged word is sent again in delta mode
+    MAX_CHANNELS = 4096  # Calculators a multiplexed connection may create
+    ids = itertools.count(1)
+
+    def __init__(self, address, recorder=None, metrics=None, pool=None, transmitter=None):
+        self.address = address
+        self.transmitter = transmitter  # BusTransmitter of the server, if it has a UDP bus
+        self.broadcasting = False  # True when the ticks are published on the bus instead of the connection
+        self.bus_sequence = 0  # Datagrams published so far
+        self.pool = pool  # SessionPool the calculators are resumed from and parked in, if any
+        self.token = None  # Session token sent by the client
+        self.superseded = False  # Set when a newer connection took the calculators over
+        self.hangup = None  # Closes the connection; set by the server running the session
+        self.recorder = recorder  # BusRecorder capturing the words of this session, if any
+        self.session_id = next(self.ids)
+        self.waiting = False  # True while the connection thread is blocked waiting for the client
+        self.metrics = metrics  # Metrics shared with the other sessions, if any
+        self.decoder = WordStreamDecoder(handshake=True)
+        self.word = DecodedWord()  # Every word received is decoded into it, whatever its channel
+        self.responses = []  # Responses to the words of one receive, emptied once queued
+        self.acknowledged = False
+        self.handshake = None  # ACK line sent to the client, recorded under every id of the session
+        self.outgoing = bytearray()  # Responses not flushed to the socket yet
+        self.tick_period = None
+        self.next_tick = None  # time.monotonic() of the next scheduled step, when the server drives the clock
+        self.keepalive = None  # Set in delta mode: unchanged words are only refreshed after this many seconds
+        self.last_word = {}  # Channel, label and SDI bits (channel << 10 | word >> 22) -> last word sent
+        self.last_sent = {}  # Channel, label and SDI bits -> when it was sent
+        self.calculator = self.new_calculator()
+        self.channels = {0: self.calculator}  # Channel -> Calculator; only channel 0 unless multiplexed
+        self.channel_ids = {0: self.session_id}  # Channel -> id its words are recorded under
+
+    def new_calculator(self) -> Calculator:
+        calculator = Calculator()
+        calculator.metrics = self.metrics
+        calculator.step_on_input = self.tick_period is None
+        return calculator
+
+    def channel(self, channel: int) -> Calculator:
+        """Calculator of a multiplexed channel, created on its first word."""
+        calculator = self.channels.get(channel)
+        if calculator is None:
+            if len(self.channels) >= self.MAX_CHANNELS:
+                raise ValueError(f"more than {self.MAX_CHANNELS} channels")
+            calculator = self.channels[channel] = self.new_calculator()
+            self.channel_ids[channel] = next(self.ids)
+            if self.recorder is not None and self.handshake is not None:
+                self.recorder.record_options(self.channel_ids[channel], self.handshake)
+        return calculator
+
+    def negotiate(self) -> dict:
+        """Apply the client's handshake options; return the ones accepted."""
+        options = self.decoder.options
+        accepted = {}
+        if BINARY in options or MUX in options:
+            accepted[BINARY] = ""
+        if MUX in options:
+            accepted[MUX] = ""
+            self.channels.clear()  # Channels only come into existence with their first word
+        if SESSION in options and self.pool is not None:
+            self.token = options[SESSION]
+            accepted[SESSION] = self.token
+            channels = self.pool.resume(self.token, self)
+            if channels is not None:
+                self.resume(channels)
+        if TICK in options:
+            rate = float(options[TICK])
+            if not math.isfinite(rate):  # NaN would pass through min and max below
+                raise ValueError("invalid tick rate")
+            rate = min(max(rate, self.MIN_TICK_RATE), self.MAX_TICK_RATE)
+            accepted[TICK] = f"{rate:g}"
+            self.tick_period = 1 / rate
+            self.next_tick = time.monotonic() + self.tick_period
+        for calculator in self.channels.values():
+            calculator.step_on_input = self.tick_period is None
+        if BUS in options and self.transmitter is not None and TICK in accepted and not self.decoder.mux:
+            self.broadcasting = True
+            group, port = self.transmitter.address
+            accepted[BUS] = f"{group}:{port}:{self.session_id}"
+        if DELTA in options:
+            self.keepalive = float(options[DELTA] or self.DEFAULT_KEEPALIVE)
+            if not math.isfinite(self.keepalive):
+                raise ValueError("invalid keep-alive interval")
+            accepted[DELTA] = f"{self.keepalive:g}"
+        return accepted
+
+    def resume(self, channels: dict):
+        """Take over the calculators of a previous connection."""
+        self.channels = channels
+        self.channel_ids = {channel: next(self.ids) for channel in channels if channel}
+        self.channel_ids[0] = self.session_id
+        if not self.decoder.mux:
+            if 0 not in channels:
+                channels[0] = self.new_calculator()
+            self.calculator = channels[0]
+        if self.metrics is not None:
+            self.metrics.sessions_resumed += 1
+
+    def supersede(self) -> dict:
+        """Give the calculators up to a newer connection of the same session token and hang up."""
+        channels, self.channels = self.channels, {}
+        self.superseded = True
+        self.next_tick = None
+        if self.hangup is not None:
+            try:
+                self.hangup()
+            except OSError:
+                pass  # Already closed
+        return channels
+
+    def close(self):
+        """Park the calculators so that the client may resume them after reconnecting."""
+        if self.token is not None:
+            self.pool.release(self.token, self)
+
+    def receive(self, nbytes: int):
+        """Process `nbytes` received into the decoder buffer, queueing every response in `outgoing`."""
+        if self.superseded:
+            return
+        words = self.decoder.consume(nbytes)
+        if self.decoder.negotiated and not self.acknowledged:
+            self.handshake = format_options(ACK, self.negotiate())
+            self.outgoing += self.handshake
+            self.acknowledged = True
+            if self.recorder is not None:
+                for record_id in self.channel_ids.values():
+                    self.recorder.record_options(record_id, self.handshake)
+        if self.decoder.mux:
+            self.receive_frames(words)
+            return
+        if self.recorder is not None:
+            self.recorder.record(self.session_id, TO_CALCULATOR, words)
+        responses = self.responses
+        if self.metrics is None:
+            for word in words:
+                # print(f"Received from {self.address}: {word}")
+                responses += self.calculator.process_data(word, self.word)
+        else:
+            clock, process, observe = time.perf_counter, self.calculator.process_data, self.metrics.processing.observe
+            for word in words:
+                start = clock()
+                responses += process(word, self.word)
+                observe(clock() - start)
+        self.queue(responses, time.monotonic())
+        responses.clear()
+
+    def receive_frames(self, frames: list):
+        """Route multiplexed (channel, word) frames to their channel's Calculator and queue the responses."""
+        now = time.monotonic()
+        clock = time.perf_counter
+        for channel, word in frames:
+            calculator = self.channel(channel)
+            if self.recorder is not None:
+                self.recorder.record(self.channel_ids[channel], TO_CALCULATOR, [word])
+            if self.metrics is None:
+                responses = calculator.process_data(word, self.word)
+            else:
+                start = clock()
+                responses = calculator.process_data(word, self.word)
+                self.metrics.processing.observe(clock() - start)
+            self.queue(responses, now, channel)
+
+    def queue(self, words: list, now: float, channel: int = 0):
+        """Queue words for sending; in delta mode, drop those unchanged since the last keep-alive."""
+        if self.keepalive is not None:
+            changed = []
+            for word in words:
+                key = channel << 10 | word >> 22
+                if self.last_word.get(key) == word and now - self.last_sent[key] < self.keepalive:
+                    continue
+                self.last_word[key] = word
+                self.last_sent[key] = now
+                changed.append(word)
+            words = changed
+        if words:
+            if self.recorder is not None:
+                self.recorder.record(self.channel_ids[channel], FROM_CALCULATOR, words)
+            if self.metrics is not None:
+                self.metrics.count_sent(words)
+            if self.decoder.mux:
+                self.outgoing += pack_frames(channel, words)
+            else:
+                self.outgoing += pack_words(words, self.decoder.binary)
+
+    def publish(self, words: list):
+        """Send the telemetry of one tick on the bus, as a single datagram."""
+        if self.recorder is not None:
+            self.recorder.record(self.session_id, FROM_CALCULATOR, words)
+        if self.metrics is not None:
+            self.metrics.count_sent(words)
+            self.metrics.datagrams_sent += 1
+        self.transmitter.send(pack_datagram(self.session_id, self.bus_sequence, words))
+        self.bus_sequence += 1
+
+    def run_due_ticks(self, now: float):
+        """Step the simulation once per tick elapsed by `now` and queue the telemetry."""
+        steps = 0
+        while self.next_tick <= now:
+            for channel, calculator in self.channels.items():
+                if self.recorder is not None:
+                    self.recorder.record(self.channel_ids[channel], STEP, [0])
+                if self.broadcasting:
+                    self.publish(calculator.angle_rise())
+                else:
+                    self.queue(calculator.angle_rise(), now, channel)
+            self.next_tick += self.tick_period
+            steps += 1
+            if steps == self.MAX_CATCH_UP:
+                self.next_tick = now + self.tick_period
+                break
+
+    def skip_ticks(self, now: float):
+        """Drop the ticks due by `now` unrun: the client is not reading, so their telemetry would only pile up."""
+        if self.next_tick <= now:
+            if self.metrics is not None:
+                self.metrics.ticks_skipped += int((now - self.next_tick) / self.tick_period) + 1
+            self.next_tick = now + self.tick_period
+
+    def take_output(self) -> bytearray:
+        """Hand over the queued responses as a single buffer."""
+        output, self.outgoing = self.outgoing, bytearray()
+        return output
+
+
 class CalculatorServer:
     """Socket server to handle multiple clients concurrently."""
 
-    def __init__(self, host="127.0.0.1", port=65432):
+    def __init__(self, host="127.0.0.1", port=65432, backlog=5, flush_interval=0.0, reuse_port=False,
+                 server_socket=None, recorder=None, metrics=None, pool=None, bus=None):
         self.host = host
         self.port = port
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)  # Allow up to 5 clients in queue
+        self.backlog = backlog  # Connections allowed to wait in the accept queue
+        # Seconds responses may wait to be coalesced with later ones; 0 flushes after every receive
+        self.flush_interval = flush_interval
+        if server_socket is None:
+            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if reuse_port:
+                # Several processes may bind the same port; the kernel balances connections among them
+                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            server_socket.bind((self.host, self.port))
+        self.server_socket = server_socket  # May also be an already bound socket inherited from a parent
+        self.server_socket.listen(self.backlog)
+        self.recorder = recorder  # BusRecorder shared by every session
+        self.metrics = metrics  # Metrics shared by every session
+        self.pool = SessionPool() if pool is None else pool  # Calculators of disconnected sessions, by token
+        self.bus = bus  # BusTransmitter the sessions asking for it publish their ticks on
+        self.sessions = {}  # Session id -> ClientSession of every open connection
+        self.connections = set()
+        self.loop = None
+        self.stopping = None
         print(f"Server started on {self.host}:{self.port}")
 
-    def handle_client(self, client_socket, address, calculator):
+    def handle_client(self, client_socket, address, session):
         """Handle a single client connection."""
         print(f"Client connected: {address}")
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.metrics is not None:
+            self.metrics.session_opened()
+        self.sessions[session.session_id] = session
+        session.hangup = lambda: client_socket.shutdown(socket.SHUT_RDWR)  # Wakes the recv below
+        deadline = None  # When the queued responses must be flushed
 
         while True:
             try:
-                words = client_socket.recv(256).decode('utf-8').strip().split("\n")
-                if not words:
+                now = time.monotonic()
+                if session.next_tick is not None and now >= session.next_tick:
+                    session.run_due_ticks(now)
+                if session.outgoing:
+                    if deadline is None:
+                        deadline = now + self.flush_interval
+                    if now >= deadline:
+                        output = session.take_output()
+                        if self.metrics is not None:
+                            self.metrics.backlog.observe(len(output) + unsent_bytes(client_socket))
+                        client_socket.settimeout(None)  # The timeout below only bounds waits for the client
+                        sending = time.monotonic()
+                        client_socket.sendall(output)
+                        deadline = None
+                        sent = time.monotonic()
+                        if session.next_tick is not None and sent - sending > session.tick_period:
+                            session.skip_ticks(sent)  # Blocked by a slow reader, as asyncio's pause_writing
+                wake = min((t for t in (deadline, session.next_tick) if t is not None), default=None)
+                client_socket.settimeout(None if wake is None else max(wake - time.monotonic(), 1e-4))
+                session.waiting = True
+                try:
+                    nbytes = client_socket.recv_into(session.decoder.get_buffer())
+                except socket.timeout:
+                    continue
+                finally:
+                    session.waiting = False
+                if not nbytes:
+                    if session.outgoing:  # The client may only have shut down its sending side
+                        client_socket.settimeout(None)
+                        client_socket.sendall(session.take_output())
                     break
-                for word in words:
-                # print(f"Received from {address}: {word}")
-                    if not word:
-                        continue
-
-                    word = int(word)
-
-                    response = calculator.process_data(word)
-                    for res in response:
-                        client_socket.sendall(str(res).encode()+"\n".encode())
+                session.receive(nbytes)
 
             except Exception as e:
+                if session.superseded:
+                    break  # Hung up by the connection that took the session over
                 print(f"Error with client {address}: {str(e)}")
+                if self.metrics is not None:
+                    self.metrics.connection_errors += 1
                 break
 
         print(f"Client disconnected: {address}")
+        session.close()
+        self.sessions.pop(session.session_id, None)
+        if self.metrics is not None:
+            self.metrics.session_closed()
         client_socket.close()
 
     def start(self):
@@ -229,15 +567,71 @@ class CalculatorServer:
         try:
             while True:
                 client_socket, address = self.server_socket.accept()
-                calculator = Calculator()
-                client_thread = threading.Thread(target=self.handle_client, args=(client_socket, address, calculator))
+                session = ClientSession(address, self.recorder, self.metrics, self.pool, self.bus)
+                client_thread = threading.Thread(target=self.handle_client, args=(client_socket, address, session),
+                                                 daemon=True)  # Do not keep a stopped server alive
                 client_thread.start()
         except KeyboardInterrupt:
             print("Shutting down server...")
         finally:
             self.server_socket.close()
+            self.close_recorder()
+
+    def start_async(self, drain_timeout=5.0):
+        """Serve every client from a single asyncio event loop instead of one thread each."""
+        from async_server import run  # Loads asyncio, which the threaded engine does without
+        run(self, drain_timeout)
+
+    def close_recorder(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def stop(self):
+        """Ask a running asyncio server to shut down gracefully; safe to call from any thread."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
 
 
 if __name__ == "__main__":
-    server = CalculatorServer()
-    server.start()
+    parser = argparse.ArgumentParser(description="ARINC 429 calculator server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--mode", choices=("thread", "asyncio"), default="thread")
+    parser.add_argument("--backlog", type=int, default=5)
+    parser.add_argument("--flush-us", type=int, default=0,
+                        help="coalesce responses for up to this many microseconds (0: flush every batch)")
+    parser.add_argument("--pool-size", type=int, default=10000,
+                        help="calculators of disconnected sessions kept for resuming (0: never resume)")
+    parser.add_argument("--pool-idle", type=float, default=600, help="seconds a disconnected session is kept")
+    parser.add_argument("--bus", metavar="GROUP[:PORT]",
+                        help="publish the ticks of the sessions asking for it on this UDP multicast or broadcast group")
+    parser.add_argument("--bus-interface", default="127.0.0.1", help="address of the interface to publish on")
+    parser.add_argument("--record", metavar="PATH", help="append every word exchanged to this bus recording")
+    parser.add_argument("--metrics-port", type=int, help="serve runtime metrics over HTTP on this port")
+    parser.add_argument("--admin-port", type=int, help="accept profiling commands on this local port")
+    parser.add_argument("--profile-dir", default=".", help="where the admin port writes profiles")
+    args = parser.parse_args()
+
+    recorder = BusRecorder(args.record) if args.record else None
+    metrics = None
+    if args.metrics_port is not None:
+        metrics = Metrics()
+        serve_metrics(metrics, args.host, args.metrics_port)
+    bus = None
+    if args.bus is not None:
+        from bus import BusTransmitter, parse_address
+        bus = BusTransmitter(*parse_address(args.bus), args.bus_interface)
+    server = CalculatorServer(args.host, args.port, args.backlog, args.flush_us / 1e6, recorder=recorder,
+                              metrics=metrics, pool=SessionPool(args.pool_size, args.pool_idle), bus=bus)
+    if args.admin_port is not None:
+        from profiler import AdminServer
+        AdminServer(server, "127.0.0.1", args.admin_port, args.profile_dir)
+
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt  # Shut down through the same path as Ctrl+C
+
+    signal.signal(signal.SIGTERM, interrupt)
+    if args.mode == "asyncio":
+        server.start_async()
+    else:
+        server.start()
@@ -0,0 +1,149 @@
+"""Vectorized simulation of many aircraft at once (python fleet.py [n_aircraft])."""
+import sys
+import time
+
+import numpy as np
+
+from arinc429 import ARINC429
+from arinc429_batch import encode_batch
+
+POWER_TO_FPS = 0.6 / 3.6 * 3.28084  # Power (%) to airspeed (ft/s), folded as in Calculator
+MAX_CLIMB = 800 / 60
+
+
+class FleetCalculator:
+    """N aircraft stored as NumPy columns and stepped together.
+
+    Each column holds the attribute of the same name on Calculator, and
+    angle_rise applies Calculator.angle_rise to every aircraft at once,
+    automatic and manual modes included.
+    """
+
+    def __init__(self, size: int):
+        self.state = np.full(size, ARINC429.ON_GROUND, dtype=np.int64)
+        self.altitude = np.zeros(size)
+        self.power = np.zeros(size)
+        self.desired_power = np.zeros(size)
+        self.climb = np.zeros(size)
+        self.angle = np.zeros(size)
+        self.desired_angle = np.zeros(size)
+        self.desired_climb = np.zeros(size)
+        self.desired_altitude = np.full(size, 40000.0)
+        self.auto = np.ones(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.state)
+
+    def validate_inputs(self):
+        np.clip(self.desired_power, 0, 100, out=self.desired_power)
+        np.clip(self.desired_angle, -16, 16, out=self.desired_angle)
+        too_fast = np.abs(self.desired_climb * 60) > 800
+        self.desired_climb[too_fast] = np.clip(self.desired_climb[too_fast], -MAX_CLIMB, MAX_CLIMB)
+
+    def angle_rise(self) -> (np.ndarray, np.ndarray):
+        """Advance every aircraft one step.
+
+        Returns the (N, 4) uint32 words for labels 001 to 004 and a mask of
+        the words actually sent: a manual aircraft idling on the ground only
+        reports label 001, like Calculator.angle_rise.
+        """
+        self.validate_inputs()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.step_auto(self.auto)
+            idle = self.step_manual(~self.auto)
+
+        values = np.stack([self.altitude, 60 * self.climb, self.angle, self.power], axis=1)
+        values[idle, 0] = 0
+        words = encode_batch(np.arange(1, 5), 0, values, self.state[:, None])
+        sent = np.ones(words.shape, dtype=bool)
+        sent[idle, 1:] = False
+        words[~sent] = 0
+        return words, sent
+
+    def step_auto(self, rows: np.ndarray):
+        diff = self.desired_power - self.power
+        step = np.where(diff < 0, np.maximum(diff / 2, -5), np.minimum(diff / 2, 5))
+        power = np.where(self.power != self.desired_power, self.power + step, self.power)
+        V = power * 0.6 / 3.6 * 3.28084
+
+        diff = self.desired_altitude - self.altitude
+        changing = np.abs(diff) > 0.1
+        angle = np.deg2rad(np.where(diff < 0, np.maximum(diff / 100, -16), np.minimum(diff / 100, 16)))
+        climb = V * np.sin(angle)
+        climb = np.where(
+            climb < 0,
+            np.maximum(np.maximum(climb, -MAX_CLIMB), self.climb - 0.05),
+            np.minimum(np.minimum(climb, MAX_CLIMB), self.climb + 0.05),
+        )
+        angle = np.where(V != 0, np.arcsin(climb / V), angle)
+
+        ground = ~changing & (np.abs(self.altitude) < 1)
+        altitude = np.where(changing, self.altitude + climb, np.where(ground, 0, self.desired_altitude))
+        state = np.where(changing, ARINC429.ALTITUDE_CHANGE, np.where(ground, ARINC429.ON_GROUND, ARINC429.CRUISE))
+
+        self.power[rows] = power[rows]
+        self.altitude[rows] = altitude[rows]
+        self.state[rows] = state[rows]
+        self.climb[rows] = np.where(changing, climb, 0)[rows]
+        self.angle[rows] = np.where(changing, np.rad2deg(angle), 0)[rows]
+
+    def step_manual(self, rows: np.ndarray) -> np.ndarray:
+        """Manual-mode step for `rows`; returns the aircraft that stayed idle on the ground."""
+        on_ground = rows & (self.state == ARINC429.ON_GROUND)
+        commanded = (self.desired_climb != 0) & (self.desired_angle != 0)
+        takeoff = on_ground & commanded
+        target = on_ground & ~commanded & (np.abs(self.desired_altitude - self.altitude) > 0.1)
+        idle = on_ground & ~takeoff & ~target
+
+        self.state[takeoff | target] = ARINC429.ALTITUDE_CHANGE
+        self.desired_altitude[takeoff] = 40000
+        self.desired_climb[target & (self.desired_climb == 0)] = 400 / 60
+        self.desired_angle[target & (self.desired_angle == 0)] = 10
+
+        active = rows & ~idle
+        diff = self.desired_altitude - self.altitude
+        moving = active & (np.abs(diff) > 0.1)
+        settled = active & ~moving
+
+        climb_target = self.desired_climb * np.minimum(np.abs(diff) / 100, 1.0)
+        climb = np.where(
+            self.desired_climb < 0,
+            np.maximum(climb_target, self.climb - 0.05),
+            np.minimum(climb_target, self.climb + 0.05),
+        )
+        self.climb[moving] = climb[moving]
+        self.altitude[moving] += climb[moving]
+
+        tilted = moving & (np.abs(self.desired_angle) > 0.1)
+        V = self.climb / np.sin(np.deg2rad(self.desired_angle))
+        power = np.maximum(50, np.minimum(V / POWER_TO_FPS, 100))
+        V = power * 0.6 / 3.6 * 3.28084
+        angle = np.rad2deg(np.where(V != 0, np.arcsin(self.climb / V), 0))
+        self.power[tilted] = power[tilted]
+        self.angle[tilted] = angle[tilted]
+
+        self.climb[settled] = 0
+        self.angle[settled] = 0
+        self.desired_climb[settled] = 0
+        self.desired_angle[settled] = 0
+        self.altitude[settled] = np.round(self.desired_altitude[settled])
+        self.state[settled] = np.where(self.altitude[settled] > 0, ARINC429.CRUISE, ARINC429.ON_GROUND)
+        return idle
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = np.random.default_rng(0)
+    fleet = FleetCalculator(size)
+    fleet.auto[:] = rng.random(size) < 0.5
+    fleet.desired_altitude[:] = rng.uniform(0, 40000, size)
+    fleet.desired_power[:] = rng.uniform(0, 100, size)
+    fleet.desired_climb[:] = rng.uniform(-800, 800, size) / 60
+    fleet.desired_angle[:] = rng.uniform(-16, 16, size)
+
+    steps = 20
+    start = time.perf_counter()
+    for _ in range(steps):
+        fleet.angle_rise()
+    elapsed = (time.perf_counter() - start) / steps
+    print(f"{size} aircraft: {elapsed * 1000:.1f} ms per step ({size / elapsed:,.0f} aircraft/s)")
@@ -0,0 +1,84 @@
+"""Full-resolution time series storage and downsampling for the GUI plots.
+
+NumPy is imported on first use, so that loading the GUI does not wait for it.
+"""
+
+
+class History:
+    """Every (x, y) point appended, with x increasing, in float32 chunks.
+
+    Memory grows by 8 bytes per point, one chunk at a time: ten hours of
+    telemetry at 10 Hz take about 3 MB.
+    """
+
+    def __init__(self, chunk_size: int = 65536):
+        self.chunk_size = chunk_size
+        self.chunks = []  # Full (2, chunk_size) chunks
+        self.current = None  # Chunk being filled, allocated with its first point
+        self.fill = 0  # Points in `current`
+
+    def __len__(self):
+        return len(self.chunks) * self.chunk_size + self.fill
+
+    def append(self, x: float, y: float):
+        if self.current is None:
+            import numpy as np
+            self.current = np.empty((2, self.chunk_size), dtype=np.float32)
+        self.current[:, self.fill] = x, y
+        self.fill += 1
+        if self.fill == self.chunk_size:
+            self.chunks.append(self.current)
+            self.current = None
+            self.fill = 0
+
+    def span(self) -> (float, float):
+        """First and last x, or None when empty."""
+        if not len(self):
+            return None
+        first = self.chunks[0] if self.chunks else self.current
+        last = self.current[:, :self.fill] if self.fill else self.chunks[-1]
+        return float(first[0, 0]), float(last[0, -1])
+
+    def between(self, low: float, high: float) -> ("numpy.ndarray", "numpy.ndarray"):
+        """x and y of the points with low <= x <= high."""
+        import numpy as np
+        parts = []
+        for chunk in self.chunks + ([self.current[:, :self.fill]] if self.fill else []):
+            if chunk[0, 0] > high or chunk[0, -1] < low:
+                continue
+            start = np.searchsorted(chunk[0], low, side="left")
+            end = np.searchsorted(chunk[0], high, side="right")
+            parts.append(chunk[:, start:end])
+        if not parts:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+        points = np.concatenate(parts, axis=1)
+        return points[0], points[1]
+
+
+def lttb(x: "numpy.ndarray", y: "numpy.ndarray", n: int) -> ("numpy.ndarray", "numpy.ndarray"):
+    """Downsample to `n` points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; in each of the n - 2 buckets in
+    between, the point forming the largest triangle with the point kept
+    before it and the average of the next bucket is kept. Peaks and steps
+    survive, unlike with plain decimation.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return x, y
+    import numpy as np
+    x64, y64 = x.astype(np.float64), y.astype(np.float64)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)  # Bucket i is edges[i]:edges[i + 1]
+    # Averages of bucket i + 1, the last point standing in as the bucket after the last one
+    counts = np.append(np.diff(edges), 1)
+    average_x = (np.add.reduceat(x64, edges) / counts)[1:].tolist()
+    average_y = (np.add.reduceat(y64, edges) / counts)[1:].tolist()
+    kept = np.empty(n, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+    a = 0
+    for i, (start, end) in enumerate(zip(edges[:-1].tolist(), edges[1:].tolist())):
+        ax, ay = x64[a], y64[a]
+        area = np.abs((ax - average_x[i]) * (y64[start:end] - ay) - (ax - x64[start:end]) * (average_y[i] - ay))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return x[kept], y[kept]
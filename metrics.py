@@ -0,0 +1,140 @@
+"""Runtime metrics of CalculatorServer, served as plain text (Prometheus exposition format).
+
+Counters are plain integers and lists indexed by label, updated without
+locks: under the threaded server a concurrent increment may rarely be
+lost, which is fine for monitoring and keeps the cost per word to a few
+attribute accesses. Read them with `Metrics.render()` or over HTTP with
+`serve_metrics` (python calculator.py --metrics-port 9429).
+"""
+import bisect
+import struct
+import threading
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows: the kernel send queue is not measured
+    fcntl = termios = None
+
+from arinc429 import ARINC429, LABELS, WIRE_TO_LABEL
+
+PROCESSING_BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2)  # Seconds per word
+# Bytes waiting to be sent: queued by the session, buffered by the transport, and in the kernel send queue
+BACKLOG_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def unsent_bytes(sock) -> int:
+    """Bytes written to `sock` that the peer has not acknowledged yet; 0 where the platform cannot tell."""
+    if termios is None or not hasattr(termios, "TIOCOUTQ"):
+        return 0
+    try:
+        return struct.unpack("i", fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, b"\0\0\0\0"))[0]
+    except OSError:
+        return 0
+
+
+class Histogram:
+    """Fixed-bucket histogram: counts[i] holds the observations <= bounds[i], the last one the rest."""
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str) -> list:
+        lines = [f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum:g}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class Metrics:
+    """Counters and histograms shared by every session of a server."""
+
+    def __init__(self):
+        self.received = [0] * 400  # Words decoded, per label
+        self.sent = [0] * 400  # Words queued for a client, per label
+        self.invalid_parity = 0
+        self.decode_failures = 0  # Valid parity but unknown label
+        self.connection_errors = 0
+        self.datagrams_sent = 0  # Ticks published on the UDP bus
+        self.ticks_skipped = 0  # Ticks not run because the client was not reading its telemetry
+        self.sessions_active = 0
+        self.sessions_total = 0
+        self.sessions_resumed = 0  # Connections that took back the calculators of a session token
+        self.processing = Histogram(PROCESSING_BUCKETS)
+        self.backlog = Histogram(BACKLOG_BUCKETS)
+
+    def rejected(self, word: int):
+        """Count a word that ARINC429.decode refused."""
+        if ARINC429.is_valid(word):
+            self.decode_failures += 1
+        else:
+            self.invalid_parity += 1
+
+    def count_sent(self, words):
+        for word in words:
+            self.sent[WIRE_TO_LABEL[word >> 24 & 0xFF]] += 1
+
+    def session_opened(self):
+        self.sessions_active += 1
+        self.sessions_total += 1
+
+    def session_closed(self):
+        self.sessions_active -= 1
+
+    def render(self) -> str:
+        lines = []
+        for name, counts in (("arinc429_words_received_total", self.received),
+                             ("arinc429_words_sent_total", self.sent)):
+            lines.append(f"# TYPE {name} counter")
+            for label, count in enumerate(counts):
+                if count or label in LABELS:
+                    lines.append(f'{name}{{label="{label:03d}"}} {count}')
+        for name, value, kind in (
+                ("arinc429_invalid_parity_total", self.invalid_parity, "counter"),
+                ("arinc429_decode_failures_total", self.decode_failures, "counter"),
+                ("arinc429_connection_errors_total", self.connection_errors, "counter"),
+                ("arinc429_bus_datagrams_sent_total", self.datagrams_sent, "counter"),
+                ("arinc429_ticks_skipped_total", self.ticks_skipped, "counter"),
+                ("arinc429_sessions_total", self.sessions_total, "counter"),
+                ("arinc429_sessions_resumed_total", self.sessions_resumed, "counter"),
+                ("arinc429_sessions_active", self.sessions_active, "gauge"),
+        ):
+            lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+        lines += self.processing.render("arinc429_word_processing_seconds")
+        lines += self.backlog.render("arinc429_send_backlog_bytes")
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(metrics: Metrics, host="127.0.0.1", port=9429) -> "ThreadingHTTPServer":
+    """Serve `metrics.render()` over HTTP from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Costly to import, rarely enabled
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics served on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,110 @@
+"""Pre-fork CalculatorServer: worker processes sharing one port, each with its own event loop.
+
+Workers bind the port themselves with SO_REUSEPORT when the platform has it;
+otherwise the supervisor binds it once and the workers inherit the socket.
+"""
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import time
+
+from async_server import run
+from calculator import CalculatorServer
+
+
+def run_worker(host, port, backlog, flush_interval, server_socket=None):
+    """Worker process entry point: serve with asyncio until SIGTERM."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Only the supervisor reacts to Ctrl+C
+    server = CalculatorServer(host, port, backlog, flush_interval, reuse_port=server_socket is None,
+                              server_socket=server_socket)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    run(server)
+
+
+class PreforkSupervisor:
+    """Run `workers` server processes and restart the ones that crash until shutdown."""
+
+    def __init__(self, workers=None, host="127.0.0.1", port=65432, backlog=128, flush_interval=0.0,
+                 restart_delay=1.0, shutdown_timeout=10.0):
+        self.workers = workers or os.cpu_count()
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.flush_interval = flush_interval
+        self.restart_delay = restart_delay  # Pause before restarting a crashed worker
+        self.shutdown_timeout = shutdown_timeout
+        self.processes = []
+        self.restarts = 0
+        self.stopping = False
+        self.server_socket = None
+        if not hasattr(socket, "SO_REUSEPORT"):
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.bind((host, port))
+
+    def spawn(self, index) -> multiprocessing.Process:
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(self.host, self.port, self.backlog, self.flush_interval, self.server_socket),
+            name=f"calculator-worker-{index}",
+        )
+        process.start()
+        return process
+
+    def stop(self, *args):
+        """Request shutdown; usable as a signal handler."""
+        self.stopping = True
+
+    def run(self) -> int:
+        """Supervise the workers until SIGTERM or Ctrl+C; return the aggregated exit status."""
+        signal.signal(signal.SIGTERM, self.stop)
+        self.processes = [self.spawn(index) for index in range(self.workers)]
+        print(f"Supervisor started {self.workers} workers on {self.host}:{self.port}")
+        try:
+            while not self.stopping:
+                multiprocessing.connection.wait([p.sentinel for p in self.processes], timeout=0.5)
+                for index, process in enumerate(self.processes):
+                    if process.is_alive() or self.stopping:
+                        continue
+                    print(f"Worker {process.name} exited with code {process.exitcode}, restarting")
+                    time.sleep(self.restart_delay)
+                    self.processes[index] = self.spawn(index)
+                    self.restarts += 1
+        except KeyboardInterrupt:
+            pass
+        return self.shutdown()
+
+    def shutdown(self) -> int:
+        """Stop every worker gracefully, kill the ones that overrun the timeout, and report."""
+        print("Shutting down workers...")
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: the worker drains its connections
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in self.processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                print(f"Worker {process.name} did not stop in time, killing it")
+                process.kill()
+                process.join()
+        failed = [p.name for p in self.processes if p.exitcode != 0]
+        print(f"Workers stopped: {len(self.processes) - len(failed)} clean, {len(failed)} failed, "
+              f"{self.restarts} restarts")
+        if self.server_socket is not None:
+            self.server_socket.close()
+        return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork ARINC 429 calculator server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--backlog", type=int, default=128)
+    parser.add_argument("--flush-us", type=int, default=0)
+    args = parser.parse_args()
+
+    supervisor = PreforkSupervisor(args.workers, args.host, args.port, args.backlog, args.flush_us / 1e6)
+    raise SystemExit(supervisor.run())
@@ -0,0 +1,144 @@
+"""On-demand sampling profiler for a running CalculatorServer, driven from a local admin port.
+
+python calculator.py --admin-port 9430, then for instance
+``echo "profile 10 3 7" | nc 127.0.0.1 9430`` samples sessions 3 and 7 for
+ten seconds (no id: every session). Samples are taken from another
+thread with sys._current_frames, so nothing is instrumented: sessions
+not being profiled only share the GIL with the sampling thread. Each sample is attributed to the session
+whose work is on the stack (socket handling, decoding, angle_rise,
+encoding), and idle waits are skipped. The profile is written as folded
+stacks (``session 3;frame;frame... count``), readable by flamegraph.pl
+or speedscope. Admin commands: sessions, profile <s> [even] [id ...], stop, status.
+
+Samples tend to pile up on socket operations, where threads release the
+GIL. ``even`` lowers the interpreter switch interval for the duration of the
+profile to spread them evenly in time. That setting is process-wide, so it
+slows down every session, profiled or not.
+"""
+import collections
+import os
+import socketserver
+import sys
+import threading
+import time
+
+
+class SamplingProfiler(threading.Thread):
+    """Sample the stacks working for `sessions` (ids, None for all) every `interval` for `duration` seconds."""
+
+    def __init__(self, duration: float, sessions=None, path="profile.folded", interval=0.001, even=False):
+        super().__init__(name="profiler", daemon=True)
+        self.duration = duration
+        self.sessions = None if sessions is None else set(sessions)
+        self.path = path
+        self.interval = interval
+        self.even = even  # Lower the switch interval of the whole process while sampling
+        self.samples = collections.Counter()  # (session id, folded stack) -> samples
+        self.stopping = threading.Event()
+
+    def run(self):
+        deadline = time.monotonic() + self.duration
+        me = threading.get_ident()
+        # With `even`, take the GIL back soon after each sleep instead of at the next blocking call,
+        # so that samples are spread evenly in time rather than piling up on socket operations
+        switch_interval = sys.getswitchinterval()
+        if self.even:
+            sys.setswitchinterval(min(switch_interval, self.interval / 10))
+        try:
+            while not self.stopping.is_set() and time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != me:
+                        self.sample(frame)
+                time.sleep(self.interval)
+        finally:
+            sys.setswitchinterval(switch_interval)
+        self.write()
+
+    def sample(self, frame):
+        stack = []
+        session = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            if session is None:
+                session = self.session_of(frame)
+            frame = frame.f_back
+        if session is None or session.waiting:
+            return
+        if self.sessions is None or session.session_id in self.sessions:
+            self.samples[session.session_id, ";".join(reversed(stack))] += 1
+
+    @staticmethod
+    def session_of(frame):
+        """The ClientSession a frame works for, if it is one of the server's."""
+        local = frame.f_locals
+        if frame.f_code.co_name == "handle_client" and hasattr(local.get("session"), "waiting"):
+            return local["session"]  # CalculatorServer.handle_client
+        owner = local.get("self")
+        owner = getattr(owner, "_protocol", owner)  # asyncio transport reading or writing for a protocol
+        session = getattr(owner, "session", None)
+        return session if hasattr(session, "waiting") else None
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+    def write(self):
+        with open(self.path, "w") as file:
+            for (session_id, stack), count in sorted(self.samples.items()):
+                file.write(f"session {session_id};{stack} {count}\n")
+
+
+class AdminHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            command, *args = line.decode().split() or [""]
+            try:
+                reply = self.server.execute(command, args)
+            except (ValueError, KeyError) as e:
+                reply = f"error: {e}"
+            self.wfile.write(reply.encode() + b"\n")
+
+
+class AdminServer(socketserver.ThreadingTCPServer):
+    """Local control channel of a CalculatorServer, served from a daemon thread."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server, host="127.0.0.1", port=9430, profile_dir="."):
+        super().__init__((host, port), AdminHandler)
+        self.calculator_server = server
+        self.profile_dir = profile_dir
+        self.profiler = None
+        threading.Thread(target=self.serve_forever, name="admin", daemon=True).start()
+        print(f"Admin commands accepted on {host}:{self.server_address[1]}")
+
+    def execute(self, command: str, args: list) -> str:
+        sessions = self.calculator_server.sessions
+        if command == "sessions":
+            return "\n".join(f"{i} {s.address}" for i, s in list(sessions.items())) or "no session"
+        if command == "status":
+            if self.profiler is None or not self.profiler.is_alive():
+                return "idle"
+            return f"profiling {sum(self.profiler.samples.values())} samples -> {self.profiler.path}"
+        if command == "profile":
+            if self.profiler is not None and self.profiler.is_alive():
+                raise ValueError("a profile is already running")
+            duration = float(args[0]) if args else 10.0
+            even = "even" in args[1:]
+            ids = [int(arg) for arg in args[1:] if arg != "even"] or None
+            for session_id in ids or ():
+                if session_id not in sessions:
+                    raise KeyError(f"no session {session_id}")
+            path = os.path.join(self.profile_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+            self.profiler = SamplingProfiler(duration, ids, path, even=even)
+            self.profiler.start()
+            spread = ", switch interval lowered for every session" if even else ""
+            return f"profiling {'every session' if ids is None else ids} for {duration:g} s{spread} -> {path}"
+        if command == "stop":
+            if self.profiler is None or not self.profiler.is_alive():
+                raise ValueError("no profile running")
+            self.profiler.stop()
+            return f"{sum(self.profiler.samples.values())} samples written to {self.profiler.path}"
+        raise ValueError(f"unknown command {command!r} (sessions, status, profile <s> [even] [id ...], stop)")
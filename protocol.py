@@ -0,0 +1,182 @@
+"""Wire framing between CalculatorServer and its clients.
+
+By default each word travels as decimal ASCII text followed by a newline.
+A client may open the connection with a handshake line such as
+``ARINC429 binary``; the server answers with the options it accepted
+(``ARINC429-OK binary``) and both sides then exchange words as packed
+4-byte big-endian integers. With ``tick=<Hz>`` the server steps each
+session at a fixed rate and pushes the telemetry, so the client only sends
+setpoints when they change, and ``delta=<s>`` suppresses words identical
+to the last one sent for their label and SDI until a keep-alive of <s>
+seconds expires. With ``mux`` every word travels in an 8-byte frame
+preceded by a 4-byte channel id: one connection then carries many
+independent sessions, the server running one Calculator per channel and
+answering on the channel of the request. ``session=<token>`` names the
+session so that a client reconnecting with the same token resumes its
+calculators where they were. With ``bus`` (and ``tick``) the telemetry of
+each tick is not sent on the connection but published as one UDP datagram
+on a multicast or broadcast group, which any number of listeners receive;
+the server answers ``bus=<group>:<port>:<source>``. A datagram is a
+12-byte header (magic, source, sequence number) followed by the words as
+in binary framing. Old text clients never send the
+handshake and keep working unchanged.
+"""
+import struct
+
+HELLO = b"ARINC429"
+ACK = b"ARINC429-OK"
+BINARY = "binary"
+TICK = "tick"  # tick=<Hz>: the server steps the simulation itself and pushes telemetry
+DELTA = "delta"  # delta=<s>: unchanged words are suppressed, then refreshed every <s> seconds
+MUX = "mux"  # (channel, word) frames, one Calculator per channel; implies binary
+SESSION = "session"  # session=<token>: resume the calculators left by a previous connection with this token
+BUS = "bus"  # Publish the ticks' telemetry on the server's UDP bus instead of the connection
+WORD_SIZE = 4
+FRAME_SIZE = 8
+MAX_LINE = 256
+DATAGRAM_MAGIC = b"A429"
+DATAGRAM_HEADER = struct.Struct(">4sII")  # Magic, source, sequence number
+
+
+def format_options(prefix: bytes, options: dict) -> bytes:
+    """Handshake line made of `prefix` then `key` or `key=value` tokens."""
+    tokens = [prefix]
+    for key, value in options.items():
+        tokens.append(f"{key}={value}".encode() if value != "" else key.encode())
+    return b" ".join(tokens) + b"\n"
+
+
+def parse_options(prefix: bytes, line: bytes) -> dict | None:
+    """Options of a handshake line, or None if the line does not start with `prefix`."""
+    tokens = line.split()
+    if not tokens or tokens[0] != prefix:
+        return None
+    options = {}
+    for token in tokens[1:]:
+        key, _, value = token.decode().partition("=")
+        options[key] = value
+    return options
+
+
+def read_line(sock, limit: int = MAX_LINE) -> bytes:
+    """Read one handshake line byte by byte, so no word after it is consumed."""
+    line = bytearray()
+    while len(line) < limit:
+        char = sock.recv(1)
+        if not char:
+            break
+        line += char
+        if char == b"\n":
+            break
+    return bytes(line)
+
+
+def pack_words(words, binary: bool = False) -> bytes:
+    """Serialize words in the negotiated framing."""
+    if binary:
+        return struct.pack(f">{len(words)}I", *words)
+    return b"".join(b"%d\n" % word for word in words)
+
+
+def pack_frames(channel: int, words) -> bytes:
+    """Serialize words of one channel as multiplexed frames."""
+    values = [channel, 0] * len(words)
+    values[1::2] = words
+    return struct.pack(f">{len(values)}I", *values)
+
+
+def pack_datagram(source: int, sequence: int, words) -> bytes:
+    """One bus datagram carrying `words`; `sequence` counts the datagrams of `source` modulo 2 ** 32."""
+    return DATAGRAM_HEADER.pack(DATAGRAM_MAGIC, source, sequence & 0xFFFFFFFF) + struct.pack(f">{len(words)}I", *words)
+
+
+def unpack_datagram(data: bytes) -> (int, int, tuple):
+    """Source, sequence number and words of a bus datagram."""
+    count, remainder = divmod(len(data) - DATAGRAM_HEADER.size, WORD_SIZE)
+    if count < 0 or remainder or data[:4] != DATAGRAM_MAGIC:
+        raise ValueError("not an ARINC429 bus datagram")
+    _, source, sequence = DATAGRAM_HEADER.unpack_from(data)
+    return source, sequence, struct.unpack_from(f">{count}I", data, DATAGRAM_HEADER.size)
+
+
+class WordStreamDecoder:
+    """Reassemble words from a byte stream, keeping partial words between reads.
+
+    Bytes are received straight into a preallocated buffer, either with
+    `recv_from` or through `get_buffer`/`consume`, and complete words are
+    handed out in batches. With `handshake=True` (server side) the stream may
+    start with a handshake line: its options end up in `options` and select
+    the framing of the words that follow. In multiplexed mode the decoder
+    hands out (channel, word) pairs instead of words.
+    """
+
+    def __init__(self, binary: bool = False, size: int = 4096, handshake: bool = False, mux: bool = False):
+        self.binary = binary or mux
+        self.mux = mux
+        self.options = None if handshake else {}
+        self.negotiated = False  # True once a handshake line has been read
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # First byte not yet decoded
+        self.end = 0  # End of the received bytes
+
+    def get_buffer(self) -> memoryview:
+        """Free space to receive into, after moving any partial word to the front."""
+        if self.start:
+            pending = self.end - self.start
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start, self.end = 0, pending
+        if self.end == len(self.buffer):
+            raise ValueError("word longer than the receive buffer")
+        return self.view[self.end:]
+
+    def consume(self, nbytes: int) -> list:
+        """Account for `nbytes` received in the buffer and return the complete words."""
+        self.end += nbytes
+        if self.options is None and not self.read_handshake():
+            return []
+        if self.mux:
+            count = (self.end - self.start) // FRAME_SIZE
+            values = struct.unpack_from(f">{2 * count}I", self.buffer, self.start)
+            words = list(zip(values[::2], values[1::2]))
+            self.start += count * FRAME_SIZE
+        elif self.binary:
+            count = (self.end - self.start) // WORD_SIZE
+            words = struct.unpack_from(f">{count}I", self.buffer, self.start)
+            self.start += count * WORD_SIZE
+        else:
+            last = self.buffer.rfind(b"\n", self.start, self.end)
+            if last < 0:
+                return []
+            words = [int(word) for word in self.buffer[self.start:last].split()]
+            self.start = last + 1
+        if self.start == self.end:
+            self.start = self.end = 0
+        return words
+
+    def read_handshake(self) -> bool:
+        """Parse the optional handshake line; False while it is still incomplete."""
+        if self.buffer[self.start] != HELLO[0]:
+            self.options = {}  # Old text client: the stream starts with a word
+            return True
+        newline = self.buffer.find(b"\n", self.start, self.end)
+        if newline < 0:
+            if self.end - self.start >= MAX_LINE:
+                raise ValueError("invalid handshake")
+            return False
+        options = parse_options(HELLO, self.buffer[self.start:newline])
+        if options is None:
+            raise ValueError("invalid handshake")
+        self.options = options
+        self.negotiated = True
+        self.mux = MUX in options
+        self.binary = BINARY in options or self.mux
+        self.start = newline + 1
+        return True
+
+    def recv_from(self, sock) -> list | None:
+        """Receive once from `sock`; None when the peer closed the connection."""
+        nbytes = sock.recv_into(self.get_buffer())
+        if not nbytes:
+            return None
+        return self.consume(nbytes)
@@ -0,0 +1,284 @@
+"""Recording of the ARINC429 words exchanged with the calculator, and replay of the recordings.
+
+A recording is a small header followed by fixed-width 20-byte records:
+monotonic timestamp (ns), session id, word and direction. Besides the
+words in both directions, a session records the handshake options it
+was granted and, when the server drives its clock, every step, so that
+replays negotiate the same options and step at the same times. Replays
+memory-map the file and walk it in chunks, so recordings larger than RAM
+can be fed back to a Calculator or to a running server
+(python recorder.py replay FILE [--host H --port P] [--realtime]).
+Recording needs only the standard library; NumPy is loaded by the replay.
+"""
+import argparse
+import itertools
+import os
+import socket
+import struct
+import threading
+import time
+
+from protocol import ACK, BINARY, DELTA, HELLO, TICK, format_options, parse_options, read_line
+
+MAGIC = b"A429REC\0"
+VERSION = 1
+HEADER = struct.Struct("<8sII")  # Magic, version, record size
+RECORD_STRUCT = struct.Struct("<qIIB3x")  # Time, session, word, direction, padding
+RECORD_FIELDS = {  # The same layout as a NumPy dtype, for replays
+    "names": ["time", "session", "word", "direction"],
+    "formats": ["<i8", "<u4", "<u4", "u1"],
+    "offsets": [0, 8, 12, 16],
+    "itemsize": RECORD_STRUCT.size,
+}
+TO_CALCULATOR = 0  # Setpoints sent by a client
+FROM_CALCULATOR = 1  # Responses and telemetry sent by the server
+OPTIONS = 2  # ACK line of the session's handshake, 4 bytes per record, NUL padded
+STEP = 3  # Simulation step of a tick; the word is 0
+REPLAYED_OPTIONS = (TICK, DELTA)  # Options a replay asks for again; tokens and buses belong to the original run
+
+
+def read_layout(path) -> (int, int):
+    """(whole records, bytes of a partial last record) of the recording at `path`; ValueError if it is not one."""
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, RECORD_STRUCT.size):
+        raise ValueError(f"{path} is not a version {VERSION} bus recording")
+    return divmod(os.path.getsize(path) - HEADER.size, RECORD_STRUCT.size)
+
+
+class BusRecorder:
+    """Append the words of every session to a recording; shareable between threads."""
+
+    def __init__(self, path, flush_size=64 * 1024, flush_interval=1.0):
+        self.path = path
+        self.flush_size = flush_size  # Bytes buffered before they are written to the file
+        self.flush_interval = flush_interval  # Seconds records may stay buffered, whatever their size
+        if os.path.exists(path) and os.path.getsize(path):
+            count, partial = read_layout(path)
+            if partial:
+                print(f"Dropping the {partial} bytes of a partial record at the end of {path}")
+                os.truncate(path, os.path.getsize(path) - partial)  # New records must stay aligned
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD_STRUCT.size))
+            self.file.flush()  # A recording is valid from the start, even if the process is killed
+        self.buffer = bytearray()
+        self.flushed_at = time.monotonic_ns()
+        self.lock = threading.Lock()
+        self.sessions = itertools.count(1)
+
+    def new_session(self) -> int:
+        """Id to tag the words of a new connection with."""
+        return next(self.sessions)
+
+    def record(self, session: int, direction: int, words):
+        """Append `words` with the current monotonic time."""
+        if not words:
+            return
+        now = time.monotonic_ns()
+        pack = RECORD_STRUCT.pack
+        records = b"".join([pack(now, session, word, direction) for word in words])
+        with self.lock:
+            if self.file.closed:  # Sessions still running after the server shut down
+                return
+            self.buffer += records
+            if len(self.buffer) >= self.flush_size or now - self.flushed_at >= self.flush_interval * 1e9:
+                self.flush_locked()
+
+    def record_options(self, session: int, line: bytes):
+        """Record the handshake answer sent to `session`."""
+        line += b"\0" * (-len(line) % 4)
+        self.record(session, OPTIONS, struct.unpack(f"<{len(line) // 4}I", line))
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+        self.flushed_at = time.monotonic_ns()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.flush_locked()
+                self.file.close()
+
+
+class BusReplay:
+    """Memory-mapped view of a recording.
+
+    `records` is a RECORD_FIELDS array backed by the file: only the pages
+    being replayed are read, whatever the size of the recording.
+    """
+
+    def __init__(self, path, chunk_size=1 << 16):
+        import numpy as np
+        self.path = path
+        self.chunk_size = chunk_size  # Records handled per vectorized step
+        count, partial = read_layout(path)
+        if partial:  # The recorder was killed, or the disk filled up, while writing a record
+            print(f"Ignoring the {partial} bytes of a partial record at the end of {path}")
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_FIELDS, mode="r", offset=HEADER.size, shape=(count,))
+        else:  # Nothing was recorded
+            self.records = np.empty(0, dtype=RECORD_FIELDS)
+
+    def __len__(self):
+        return len(self.records)
+
+    def duration(self) -> float:
+        """Seconds between the first and the last record."""
+        if not len(self.records):
+            return 0.0
+        return (int(self.records["time"][-1]) - int(self.records["time"][0])) / 1e9
+
+    def sessions(self) -> list:
+        """Ids of the sessions present in the recording."""
+        import numpy as np
+        sessions = set()
+        for start in range(0, len(self.records), self.chunk_size):
+            sessions.update(np.unique(self.records["session"][start:start + self.chunk_size]).tolist())
+        return sorted(sessions)
+
+    def chunks(self, direction=TO_CALCULATOR, session=None):
+        """Yield the records of `direction`, or of a tuple of directions, (and `session`) chunk by chunk, in order."""
+        import numpy as np
+        for start in range(0, len(self.records), self.chunk_size):
+            chunk = self.records[start:start + self.chunk_size]
+            keep = np.isin(chunk["direction"], direction)
+            if session is not None:
+                keep &= chunk["session"] == session
+            yield chunk[keep]
+
+    def options(self, session=None) -> dict:
+        """Session id -> handshake options it was granted, for the sessions that negotiated."""
+        lines = {}
+        for chunk in self.chunks(OPTIONS, session):
+            for session_id, word in zip(chunk["session"].tolist(), chunk["word"].tolist()):
+                lines.setdefault(session_id, bytearray()).extend(struct.pack("<I", word))
+        return {session_id: parse_options(ACK, bytes(line).rstrip(b"\0")) for session_id, line in lines.items()}
+
+    def pace(self, realtime: bool):
+        """Return a function sleeping until a record is due, or None to go as fast as possible."""
+        if not realtime or not len(self.records):
+            return None
+        origin = int(self.records["time"][0])
+        start = time.monotonic()
+
+        def wait(timestamp):
+            delay = start + (timestamp - origin) / 1e9 - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return wait
+
+    def replay_calculator(self, factory, session=None, realtime=False) -> dict:
+        """Feed the recorded setpoints to one `factory()` calculator per session; return them by session id.
+
+        Sessions that negotiated ticks step at their recorded steps rather than on every setpoint.
+        """
+        calculators = {}
+        options = self.options(session)
+        wait = self.pace(realtime)
+        for chunk in self.chunks((TO_CALCULATOR, STEP), session):
+            for timestamp, session_id, word, direction in zip(chunk["time"].tolist(), chunk["session"].tolist(),
+                                                              chunk["word"].tolist(), chunk["direction"].tolist()):
+                if wait is not None:
+                    wait(timestamp)
+                calculator = calculators.get(session_id)
+                if calculator is None:
+                    calculator = calculators[session_id] = factory()
+                    calculator.step_on_input = TICK not in options.get(session_id, {})
+                if direction == STEP:
+                    calculator.step()
+                else:
+                    calculator.process_data(word)
+        return calculators
+
+    def replay_socket(self, host="127.0.0.1", port=65432, session=None, realtime=False) -> (int, int):
+        """Send the recorded setpoints to a server, one binary connection per session.
+
+        Each connection asks for the tick rate and delta keep-alive its
+        session was granted; the server then steps tick sessions on its own
+        clock, which only matches the recording with `realtime`. Responses
+        are read and discarded in the background so that the server never
+        blocks on a full socket. Returns the words sent and the response
+        bytes received.
+        """
+        import numpy as np
+        options = self.options(session)
+        connections = {}
+        readers = []
+        received = [0]
+
+        def drain(sock):
+            buffer = bytearray(1 << 16)
+            while nbytes := sock.recv_into(buffer):
+                received[0] += nbytes
+
+        def connect(session_id):
+            sock = socket.create_connection((host, port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            requested = {key: value for key, value in options.get(session_id, {}).items() if key in REPLAYED_OPTIONS}
+            sock.sendall(format_options(HELLO, {BINARY: "", **requested}))
+            if parse_options(ACK, read_line(sock)) is None:
+                raise ConnectionError(f"{host}:{port} does not speak the binary protocol")
+            reader = threading.Thread(target=drain, args=(sock,), daemon=True)
+            reader.start()
+            readers.append(reader)
+            connections[session_id] = sock
+            return sock
+
+        sent = 0
+        wait = self.pace(realtime)
+        try:
+            for chunk in self.chunks(TO_CALCULATOR, session):
+                if wait is None:
+                    for session_id in np.unique(chunk["session"]).tolist():
+                        words = chunk["word"][chunk["session"] == session_id]
+                        sock = connections.get(session_id) or connect(session_id)
+                        sock.sendall(words.astype(">u4").tobytes())
+                else:
+                    for timestamp, session_id, word in zip(chunk["time"].tolist(), chunk["session"].tolist(),
+                                                           chunk["word"].tolist()):
+                        wait(timestamp)
+                        sock = connections.get(session_id) or connect(session_id)
+                        sock.sendall(struct.pack(">I", word))
+                sent += len(chunk)
+            if wait is not None:
+                wait(int(self.records["time"][-1]))  # Let the server tick as long as the recorded sessions did
+        finally:
+            for sock in connections.values():
+                sock.shutdown(socket.SHUT_WR)  # The server closes the connection once it has answered
+            for reader in readers:
+                reader.join()
+            for sock in connections.values():
+                sock.close()
+        return sent, received[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or replay an ARINC 429 bus recording")
+    parser.add_argument("command", choices=("info", "replay"))
+    parser.add_argument("path")
+    parser.add_argument("--host", help="replay to this server instead of a local Calculator")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--session", type=int, help="only replay this session id")
+    parser.add_argument("--realtime", action="store_true", help="keep the recorded timing")
+    args = parser.parse_args()
+
+    from calculator import Calculator  # Not at the top: calculator imports this module
+
+    replay = BusReplay(args.path)
+    if args.command == "info":
+        print(f"{len(replay)} records, {len(replay.sessions())} sessions, {replay.duration():.3f} s")
+    else:
+        start = time.perf_counter()
+        if args.host:
+            sent, received = replay.replay_socket(args.host, args.port, args.session, args.realtime)
+            print(f"{sent} words sent, {received} bytes received in {time.perf_counter() - start:.3f} s")
+        else:
+            calculators = replay.replay_calculator(Calculator, args.session, args.realtime)
+            print(f"Replayed into {len(calculators)} calculators in {time.perf_counter() - start:.3f} s")
@@ -0,0 +1,71 @@
+"""Calculators of disconnected sessions, kept so that a reconnecting client resumes its flight.
+
+A client names its session with ``session=<token>`` in the handshake.
+When the connection drops, the session's calculators are parked here
+under that token, and a later connection presenting the same token takes
+them back instead of starting from the ground. Parked sessions are
+evicted after `idle_timeout` seconds and, least recently parked first,
+whenever more than `max_calculators` calculators are held, which bounds
+the memory left behind by clients that never come back.
+"""
+import collections
+import threading
+import time
+
+MAX_TOKEN = 64  # Characters
+
+
+class SessionPool:
+    """Token -> calculators of the sessions that may be resumed; shareable between threads."""
+
+    def __init__(self, max_calculators=10000, idle_timeout=600.0):
+        self.max_calculators = max_calculators
+        self.idle_timeout = idle_timeout  # Seconds a parked session is kept
+        self.parked = collections.OrderedDict()  # Token -> (channels, time.monotonic() parked), oldest first
+        self.held = 0  # Calculators in `parked`
+        self.owners = {}  # Token -> ClientSession currently using its calculators
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.parked)
+
+    def resume(self, token: str, session) -> dict | None:
+        """Hand the calculators of `token` to `session`, or None if there is nothing to resume.
+
+        A client reconnecting before its previous connection was noticed as
+        dead takes the calculators over from it: the previous connection
+        stops stepping them and is closed.
+        """
+        if not token or len(token) > MAX_TOKEN:
+            raise ValueError(f"session token must have 1 to {MAX_TOKEN} characters")
+        with self.lock:
+            self.evict_locked(time.monotonic())
+            previous = self.owners.get(token)
+            self.owners[token] = session
+            if previous is not None:
+                return previous.supersede()
+            entry = self.parked.pop(token, None)
+            if entry is None:
+                return None
+            self.held -= len(entry[0])
+            return entry[0]
+
+    def release(self, token: str, session):
+        """Park the calculators of a closed session, unless another connection took them over."""
+        with self.lock:
+            if self.owners.get(token) is not session:
+                return
+            del self.owners[token]
+            if self.max_calculators <= 0 or not session.channels:
+                return
+            self.parked[token] = (session.channels, time.monotonic())
+            self.held += len(session.channels)
+            self.evict_locked(time.monotonic())
+
+    def evict_locked(self, now: float):
+        while self.parked:
+            token, (channels, parked) = next(iter(self.parked.items()))
+            if self.held <= self.max_calculators and now - parked < self.idle_timeout:
+                break
+            del self.parked[token]
+            self.held -= len(channels)